@@ -99,6 +99,33 @@ else:
         "default": dj_database_url.parse(DATABASE_URL, conn_max_age=600)
     }
 
+# ===============================
+# 🧠 Cache
+# ===============================
+REDIS_URL = env("REDIS_URL", default=None)
+CACHE_DIR = env("CACHE_DIR", default=None)
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+elif CACHE_DIR:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": CACHE_DIR,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 # ===============================
 # 🔤 Password Validation
 # ===============================
@@ -123,17 +150,70 @@ USE_TZ = True
 STATIC_URL = "/static/"
 STATICFILES_DIRS = [BASE_DIR / "static"]
 STATIC_ROOT = BASE_DIR / "staticfiles"
-STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+# Static files with a 12-character content hash in their name, such as the
+# encoded landing videos, are cached forever.
+WHITENOISE_IMMUTABLE_FILE_TEST = r"\.[0-9a-f]{12}\.\w+$"
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+STORAGES = {
+    # Uploads are named by content hash, see main.storage.
+    "default": {"BACKEND": "main.storage.ContentAddressedStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+# Content-hashed media is cached forever; this applies to anything else.
+MEDIA_CACHE_MAX_AGE = env.int("MEDIA_CACHE_MAX_AGE", default=3600)
+# Internal nginx location aliased to MEDIA_ROOT, e.g. "/protected-media/".
+# When set, media responses only carry headers and nginx sends the file.
+MEDIA_ACCEL_REDIRECT = env("MEDIA_ACCEL_REDIRECT", default="")
+# On-demand resizes at /media/resize/<width>/<path>, see main.resize.
+RESIZE_MAX_WIDTH = env.int("RESIZE_MAX_WIDTH", default=2560)
+RESIZE_CACHE_DIR = env("RESIZE_CACHE_DIR", default=str(BASE_DIR / "cache" / "resized"))
+RESIZE_CACHE_MAX_BYTES = env.int("RESIZE_CACHE_MAX_BYTES", default=1024 ** 3)
+RESIZE_CACHE_SWEEP_INTERVAL = env.int("RESIZE_CACHE_SWEEP_INTERVAL", default=60)
+
 # ===============================
 # 📝 Crispy Forms
 # ===============================
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
+# ===============================
+# 🚗 Listings Feed
+# ===============================
+LISTINGS_PAGE_SIZE = env.int("LISTINGS_PAGE_SIZE", default=24)
+LISTINGS_CACHE_TIMEOUT = env.int("LISTINGS_CACHE_TIMEOUT", default=300)
+LISTINGS_FACETS_CACHE_TIMEOUT = env.int("LISTINGS_FACETS_CACHE_TIMEOUT", default=60)
+LISTINGS_STREAM_CHUNK_SIZE = env.int("LISTINGS_STREAM_CHUNK_SIZE", default=100)
+
+# ===============================
+# 🖼️ Image Jobs
+# ===============================
+IMAGE_JOB_MAX_ATTEMPTS = env.int("IMAGE_JOB_MAX_ATTEMPTS", default=3)
+# Seconds before a running job is assumed abandoned and queued again.
+IMAGE_JOB_TIMEOUT = env.int("IMAGE_JOB_TIMEOUT", default=600)
+IMAGE_JOB_POLL_INTERVAL = env.int("IMAGE_JOB_POLL_INTERVAL", default=2)
+
+# ===============================
+# ❤️ Likes
+# ===============================
+# SQLite file likes are buffered in before `manage.py flush_like_buffer`
+# writes them to the database; empty writes them synchronously. The buffer
+# is per host, so run a flusher next to every web server, and monitor it with
+# `manage.py flush_like_buffer --stats` (pending events and the flush lag).
+LIKE_BUFFER_PATH = env("LIKE_BUFFER_PATH", default="")
+LIKE_BUFFER_FLUSH_INTERVAL = env.float("LIKE_BUFFER_FLUSH_INTERVAL", default=1)
+
+# ===============================
+# 📈 Trending
+# ===============================
+# Hours for an event's weight in the trending score to halve.
+TRENDING_HALF_LIFE = env.float("TRENDING_HALF_LIFE", default=24)
+# Scores that have decayed below this are dropped from the trending sort.
+TRENDING_MIN_SCORE = env.float("TRENDING_MIN_SCORE", default=0.05)
+TRENDING_POLL_INTERVAL = env.int("TRENDING_POLL_INTERVAL", default=30)
+
 # ===============================
 # 📧 Email
 # ===============================
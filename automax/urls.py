@@ -13,20 +13,23 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
-from django.conf.urls.static import static
+from django.urls import path, include, re_path
 
 from main import urls as main_app_urls
+from main.media import resize_media, serve_media
 from users import urls as users_app_urls
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include(main_app_urls)),
     path('', include(users_app_urls)),
+    # Before the media route, which would otherwise match resize/ too.
+    path(f"{settings.MEDIA_URL.lstrip('/')}resize/<int:width>/<path:path>",
+         resize_media, name='media_resize'),
+    re_path(r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')),
+            serve_media, name='media'),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL,
-                          document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Listing, LikedListing
+from .models import ImageJob, Listing, LikedListing, TrendingScore
 
 
 class ListingAdmin(admin.ModelAdmin):
@@ -11,5 +11,17 @@ class LikedListingAdmin(admin.ModelAdmin):
     readonly_fields = ('id', )
 
 
+class ImageJobAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'object_id', 'status', 'attempts', 'updated_at')
+    list_filter = ('kind', 'status')
+
+
+class TrendingScoreAdmin(admin.ModelAdmin):
+    list_display = ('listing', 'score')
+    ordering = ('-score',)
+
+
 admin.site.register(Listing, ListingAdmin)
-admin.site.register(LikedListing, LikedListingAdmin)
\ No newline at end of file
+admin.site.register(LikedListing, LikedListingAdmin)
+admin.site.register(ImageJob, ImageJobAdmin)
+admin.site.register(TrendingScore, TrendingScoreAdmin)
@@ -0,0 +1,89 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .pagination import KeysetPage
+
+GENERATION_KEY = 'listings:generation'
+STATS_KEYS = {
+    'hits': 'listings:stats:hits',
+    'misses': 'listings:stats:misses',
+}
+CURSOR_PARAMS = ('after', 'before')
+
+
+def get_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Seed with a value no earlier generation could have had, so entries
+        # written before the counter was evicted can never be served again.
+        cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        get_generation()
+
+
+def record(stat):
+    key = STATS_KEYS[stat]
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, timeout=None)
+
+
+def get_stats():
+    return {stat: cache.get(key, 0) for stat, key in STATS_KEYS.items()}
+
+
+def reset_stats():
+    cache.delete_many(list(STATS_KEYS.values()))
+
+
+def normalize_query(params, keys):
+    """Canonical querystring for the given params, ignoring unknown keys,
+    blank values and parameter order."""
+    items = sorted((key, value) for key in set(keys)
+                   for value in params.getlist(key) if value)
+    return urlencode(items)
+
+
+def page_cache_key(query, per_page):
+    digest = hashlib.sha1(query.encode()).hexdigest()
+    return f'listings:page:{get_generation()}:{per_page}:{digest}'
+
+
+def get_cached_page(paginator, params, filter_keys):
+    """Return the requested page, caching the ordered listing ids.
+
+    Entries are keyed by the normalized filters and cursor, and become
+    unreachable as soon as a listing is saved or deleted.
+    """
+    query = normalize_query(params, [*filter_keys, *CURSOR_PARAMS])
+    key = page_cache_key(query, paginator.per_page)
+    cached = cache.get(key)
+    if cached is not None:
+        record('hits')
+        listings = paginator.queryset.in_bulk(cached['ids'])
+        object_list = [listings[pk] for pk in cached['ids'] if pk in listings]
+        return KeysetPage(paginator, object_list, cached['has_next'],
+                          cached['has_previous'])
+
+    record('misses')
+    page = paginator.get_page(after=params.get('after'),
+                              before=params.get('before'))
+    cache.set(key, {
+        'ids': [listing.pk for listing in page],
+        'has_next': page.has_next,
+        'has_previous': page.has_previous,
+    }, settings.LISTINGS_CACHE_TIMEOUT)
+    return page
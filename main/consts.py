@@ -19,4 +19,43 @@ CARS_BRANDS = (
 TRANSMISSION_OPTIONS = (
     ('automatic', 'Automatic'),
     ('manual', 'Manual'),
-)
\ No newline at end of file
+)
+
+FEED_ORDERING = ('-created_at', '-id')
+SEARCH_ORDERING = ('-search_rank', '-id')
+POPULAR_ORDERING = ('-like_count', '-created_at', '-id')
+TRENDING_ORDERING = ('-trending_score', '-id')
+
+# How much each kind of engagement adds to a listing's trending score.
+TRENDING_WEIGHTS = {
+    'view': 1.0,
+    'like': 3.0,
+    'inquiry': 5.0,
+}
+
+# Upper bounds of the "Under N miles" facet, matching the mileage__lt filter.
+MILEAGE_BUCKETS = (10000, 25000, 50000, 100000, 150000)
+
+# Bounding boxes of the derivatives generated for every listing image.
+LISTING_IMAGE_SIZES = {
+    'card': (640, 480),
+    'detail': (1280, 960),
+    'full': (1920, 1440),
+}
+
+# Bounding box of the inline placeholder stored for every image.
+PLACEHOLDER_SIZE = (16, 16)
+
+# Square crops generated for every profile photo. Feed cards show the
+# avatar at 30x30, so it is rendered at twice that for high-DPI screens.
+PROFILE_PHOTO_SIZES = {
+    'avatar': (60, 60),
+}
+
+# Pre-encoded renditions of the landing page video: name, height, peak
+# bitrate and the media query that selects it (the last one is the default).
+LANDING_VIDEO_RENDITIONS = (
+    ('480p', 480, '700k', '(max-width: 640px)'),
+    ('720p', 720, '1800k', '(max-width: 1280px)'),
+    ('1080p', 1080, '4000k', ''),
+)
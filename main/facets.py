@@ -0,0 +1,101 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import BooleanField, Case, Count, IntegerField, Value, When
+
+from .cache import CURSOR_PARAMS, get_generation, normalize_query
+from .consts import CARS_BRANDS, MILEAGE_BUCKETS, TRANSMISSION_OPTIONS
+
+FACET_PARAMS = ('brand', 'transmisson', 'mileage__lt')
+
+
+def get_facets(listing_filter):
+    """Counts per brand, transmission and mileage bucket for the home page.
+
+    Each facet respects every active filter except its own, so the counts
+    show what picking that option would return.
+    """
+    params = listing_filter.data
+    query = normalize_query(params, listing_filter.filters)
+    digest = hashlib.sha1(query.encode()).hexdigest()
+    key = f'listings:facets:{get_generation()}:{digest}'
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(listing_filter)
+        cache.set(key, facets, settings.LISTINGS_FACETS_CACHE_TIMEOUT)
+
+    # Each option links to the current filters with that option toggled.
+    for param, options in facets.items():
+        for option in options:
+            query = params.copy()
+            for cursor_param in CURSOR_PARAMS:
+                query.pop(cursor_param, None)
+            query.pop(param, None)
+            if not option['active']:
+                query[param] = option['value']
+            option['query'] = query.urlencode()
+    return facets
+
+
+def compute_facets(listing_filter):
+    # Counting every combination of the three facets in one grouped query
+    # lets each facet be derived in Python with the others applied.
+    base_data = listing_filter.data.copy()
+    for param in FACET_PARAMS:
+        base_data.pop(param, None)
+    base = type(listing_filter)(base_data, queryset=listing_filter.queryset).qs
+
+    active = {param: None for param in FACET_PARAMS}
+    if listing_filter.is_bound and listing_filter.form.is_valid():
+        active.update({param: listing_filter.form.cleaned_data.get(param)
+                       for param in FACET_PARAMS})
+    max_mileage = active['mileage__lt']
+
+    rows = base.order_by().values(
+        'brand', 'transmisson',
+        bucket=Case(
+            *[When(mileage__lt=bound, then=Value(index))
+              for index, bound in enumerate(MILEAGE_BUCKETS)],
+            default=Value(len(MILEAGE_BUCKETS)),
+            output_field=IntegerField(),
+        ),
+        in_range=Case(
+            When(mileage__lt=max_mileage, then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        ) if max_mileage is not None else Value(True),
+    ).annotate(count=Count('pk'))
+
+    brands = dict.fromkeys((value for value, _ in CARS_BRANDS), 0)
+    transmissions = dict.fromkeys(
+        (value for value, _ in TRANSMISSION_OPTIONS), 0)
+    buckets = [0] * len(MILEAGE_BUCKETS)
+    for row in rows:
+        brand_matches = active['brand'] in (None, '', row['brand'])
+        transmission_matches = active['transmisson'] in (
+            None, '', row['transmisson'])
+        if transmission_matches and row['in_range'] and row['brand'] in brands:
+            brands[row['brand']] += row['count']
+        if (brand_matches and row['in_range']
+                and row['transmisson'] in transmissions):
+            transmissions[row['transmisson']] += row['count']
+        if brand_matches and transmission_matches:
+            # "Under N" buckets are cumulative.
+            for index in range(row['bucket'], len(MILEAGE_BUCKETS)):
+                buckets[index] += row['count']
+
+    return {
+        'brand': [
+            {'value': value, 'label': label, 'count': brands[value],
+             'active': active['brand'] == value}
+            for value, label in CARS_BRANDS],
+        'transmisson': [
+            {'value': value, 'label': label, 'count': transmissions[value],
+             'active': active['transmisson'] == value}
+            for value, label in TRANSMISSION_OPTIONS],
+        'mileage__lt': [
+            {'value': bound, 'label': f'Under {bound:,} miles',
+             'count': buckets[index], 'active': max_mileage == bound}
+            for index, bound in enumerate(MILEAGE_BUCKETS)],
+    }
@@ -1,11 +1,49 @@
 import django_filters
 
+from .consts import (FEED_ORDERING, POPULAR_ORDERING, SEARCH_ORDERING,
+                     TRENDING_ORDERING)
 from .models import Listing
+from .search import search_listings
 
 
 class ListingFilter(django_filters.FilterSet):
+    q = django_filters.CharFilter(method='filter_search', label='Search')
+    sort = django_filters.ChoiceFilter(
+        choices=(('popular', 'Most liked'), ('trending', 'Trending')), empty_label='Newest',
+        method='filter_sort', label='Sort')
 
     class Meta:
         model = Listing
         fields = {'transmisson': ['exact'], 'brand': [
-            'exact'], 'model': ['icontains'], 'mileage': ['lt']}
\ No newline at end of file
+            'exact'], 'mileage': ['lt']}
+
+    def filter_search(self, queryset, name, value):
+        return search_listings(queryset, value)
+
+    def filter_sort(self, queryset, name, value):
+        # Ordering is applied by the paginator, see ordering.
+        if value == 'trending':
+            return queryset.trending()
+        return queryset
+
+    @property
+    def ordering(self):
+        if not (self.is_bound and self.form.is_valid()):
+            return FEED_ORDERING
+        if self.form.cleaned_data.get('q'):
+            return SEARCH_ORDERING
+        if self.form.cleaned_data.get('sort') == 'popular':
+            # Walks listing_popular_idx.
+            return POPULAR_ORDERING
+        if self.form.cleaned_data.get('sort') == 'trending':
+            # Walks trending_score_idx.
+            return TRENDING_ORDERING
+        return FEED_ORDERING
+
+    @property
+    def cacheable(self):
+        # Likes and update_trending move listings in these orders with
+        # update(), which does not bump the cache generation, so cached
+        # pages would keep a stale order and their cursors would skip or
+        # repeat rows.
+        return self.ordering not in (POPULAR_ORDERING, TRENDING_ORDERING)
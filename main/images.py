@@ -0,0 +1,165 @@
+import base64
+from io import BytesIO
+from pathlib import PurePath
+
+from django.core.files.base import ContentFile
+from PIL import ExifTags, Image, ImageOps
+
+from .consts import LISTING_IMAGE_SIZES, PLACEHOLDER_SIZE, PROFILE_PHOTO_SIZES
+
+# Pillow format name and save options of every format we encode, in the
+# order browsers should prefer them.
+FORMATS = {
+    'avif': ('AVIF', {'quality': 50}),
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+MODERN_FORMATS = ('avif', 'webp')
+CONTENT_TYPES = {
+    'avif': 'image/avif',
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+}
+
+
+def modern_formats():
+    """The modern formats this Pillow build can write.
+
+    AVIF needs Pillow 11.3+ (or the pillow-avif-plugin), so it is skipped
+    rather than failing uploads on older installs.
+    """
+    Image.init()
+    return [fmt for fmt in MODERN_FORMATS if FORMATS[fmt][0] in Image.SAVE]
+
+
+def open_image(field_file, size=None):
+    """Open an uploaded image, upright and in RGB.
+
+    With ``size`` set, JPEGs are decoded straight at the smallest scale that
+    still covers it, which is much faster than decoding the full image.
+    Returns the image and the upright size of the full upload.
+    """
+    field_file.open('rb')
+    try:
+        image = Image.open(field_file)
+        width, height = image.size
+        # EXIF orientations 5-8 are rotated by 90 degrees.
+        if image.getexif().get(ExifTags.Base.Orientation, 1) in (5, 6, 7, 8):
+            width, height = height, width
+        if size:
+            image.draft('RGB', size)
+        image = ImageOps.exif_transpose(image)
+    finally:
+        field_file.close()
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    return image.convert('RGB'), (width, height)
+
+
+def encode(image, fmt):
+    pillow_format, options = FORMATS[fmt]
+    buffer = BytesIO()
+    image.save(buffer, pillow_format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def resize(image, size):
+    resized = image.copy()
+    resized.thumbnail(size, Image.Resampling.LANCZOS)
+    return resized
+
+
+def dominant_color(image):
+    """The most common of a few representative colours, as ``#rrggbb``."""
+    paletted = resize(image, (64, 64)).quantize(colors=4)
+    _, index = max(paletted.getcolors())
+    red, green, blue = paletted.getpalette()[index * 3:index * 3 + 3]
+    return f'#{red:02x}{green:02x}{blue:02x}'
+
+
+def placeholder(image):
+    """A tiny, blurry copy of ``image`` as a data URI, a few hundred bytes
+    that can be inlined while the real image loads."""
+    fmt = 'webp' if 'webp' in modern_formats() else 'jpeg'
+    pillow_format, _ = FORMATS[fmt]
+    buffer = BytesIO()
+    resize(image, PLACEHOLDER_SIZE).save(buffer, pillow_format, quality=30)
+    data = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:{CONTENT_TYPES[fmt]};base64,{data}'
+
+
+def save_variants(field_file, image, filename_stem):
+    """Store ``image`` in every modern format next to ``field_file``.
+
+    Returns ``{format: stored name}`` and ``{format: bytes}``.
+    """
+    names, sizes = {}, {}
+    for fmt in modern_formats():
+        content = encode(image, fmt)
+        name = field_file.field.generate_filename(
+            field_file.instance, f'{filename_stem}.{fmt}')
+        names[fmt] = field_file.storage.save(name, content)
+        sizes[fmt] = content.size
+    return names, sizes
+
+
+def generate_listing_derivatives(listing):
+    """Render every size of ``listing.image`` as JPEG and modern formats.
+
+    Returns the bytes written per size and format, for reporting.
+    """
+    largest = max(LISTING_IMAGE_SIZES.values())
+    stem = PurePath(listing.image.name).stem
+    original, (listing.image_width, listing.image_height) = open_image(
+        listing.image, largest)
+    listing.image_color = dominant_color(original)
+    listing.image_placeholder = placeholder(original)
+
+    update_fields = ['image_variants', 'images_pending', 'image_width',
+                     'image_height', 'image_color', 'image_placeholder']
+    variants, written = {}, {}
+    for name, size in LISTING_IMAGE_SIZES.items():
+        resized = resize(original, size)
+        content = encode(resized, 'jpeg')
+        field = getattr(listing, f'image_{name}')
+        field.save(f'{stem}_{name}.jpg', content, save=False)
+        update_fields.append(f'image_{name}')
+        variants[name], written[name] = save_variants(
+            field, resized, f'{stem}_{name}')
+        written[name]['jpeg'] = content.size
+    listing.image_variants = variants
+    listing.images_pending = False
+    listing.save(update_fields=update_fields)
+    return written
+
+
+def generate_profile_variants(profile):
+    """Render the square crops of ``profile.photo`` as JPEG and modern
+    formats.
+
+    Returns the bytes written per size and format, for reporting.
+    """
+    stem = PurePath(profile.photo.name).stem
+    original, (profile.photo_width, profile.photo_height) = open_image(
+        profile.photo, max(PROFILE_PHOTO_SIZES.values()))
+    profile.photo_color = dominant_color(original)
+    profile.photo_placeholder = placeholder(original)
+
+    update_fields = ['photo_variants', 'photo_width', 'photo_height',
+                     'photo_color', 'photo_placeholder']
+    variants, written = {}, {}
+    for name, size in PROFILE_PHOTO_SIZES.items():
+        cropped = ImageOps.fit(original, size, Image.Resampling.LANCZOS)
+        content = encode(cropped, 'jpeg')
+        field = getattr(profile, f'photo_{name}')
+        field.save(f'{stem}_{name}.jpg', content, save=False)
+        update_fields.append(f'photo_{name}')
+        variants[name], written[name] = save_variants(
+            field, cropped, f'{stem}_{name}')
+        written[name]['jpeg'] = content.size
+    profile.photo_variants = variants
+    profile.save(update_fields=update_fields)
+    return written
@@ -0,0 +1,111 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from users.models import Profile
+from .images import generate_listing_derivatives, generate_profile_variants
+from .models import ImageJob, Listing
+
+
+def enqueue(kind, object_id):
+    """Queue image work for an object, unless it is already queued."""
+    job, _ = ImageJob.objects.get_or_create(
+        kind=kind, object_id=str(object_id), status=ImageJob.PENDING)
+    return job
+
+
+def enqueue_listing_images(listing):
+    """Mark ``listing`` as waiting for its resized images and queue them.
+
+    Cards render a placeholder instead of the original upload until the
+    worker has finished.
+    """
+    if not listing.images_pending:
+        listing.images_pending = True
+        # save() rather than update() so cached feed pages are invalidated.
+        listing.save(update_fields=['images_pending'])
+    return enqueue(ImageJob.LISTING, listing.pk)
+
+
+def enqueue_profile_photo(profile):
+    return enqueue(ImageJob.PROFILE, profile.pk)
+
+
+def give_up(jobs, error):
+    """Mark ``jobs`` failed for good."""
+    listing_ids = list(jobs.filter(
+        kind=ImageJob.LISTING).values_list('object_id', flat=True))
+    failed = jobs.update(status=ImageJob.FAILED, error=error,
+                         updated_at=timezone.now())
+    # Show the original upload rather than a placeholder forever.
+    Listing.objects.filter(pk__in=listing_ids).update(images_pending=False)
+    return failed
+
+
+def requeue_stale_jobs():
+    """Hand jobs of workers that died mid-job back to the queue.
+
+    A job that has already been tried IMAGE_JOB_MAX_ATTEMPTS times is
+    failed instead, so an image that crashes or runs the worker out of
+    memory is not retried forever.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.IMAGE_JOB_TIMEOUT)
+    stale = ImageJob.objects.filter(
+        status=ImageJob.RUNNING, updated_at__lt=cutoff)
+    give_up(stale.filter(attempts__gte=settings.IMAGE_JOB_MAX_ATTEMPTS),
+            'The worker stopped while running the job.')
+    return stale.update(status=ImageJob.PENDING, updated_at=timezone.now())
+
+
+def claim_next_job():
+    """Take the oldest pending job, or return None if there is none.
+
+    The job is claimed with a conditional UPDATE, so several workers can
+    poll the same table without running a job twice.
+    """
+    while True:
+        job = ImageJob.objects.filter(
+            status=ImageJob.PENDING).order_by('created_at', 'id').first()
+        if job is None:
+            return None
+        claimed = ImageJob.objects.filter(
+            pk=job.pk, status=ImageJob.PENDING,
+        ).update(status=ImageJob.RUNNING, attempts=F('attempts') + 1,
+                 updated_at=timezone.now())
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def run_job(job):
+    """Render the images of ``job``, recording the outcome on the job.
+
+    Returns True if the job succeeded.
+    """
+    try:
+        if job.kind == ImageJob.LISTING:
+            listing = Listing.objects.filter(pk=job.object_id).first()
+            if listing is not None and listing.image:
+                generate_listing_derivatives(listing)
+        elif job.kind == ImageJob.PROFILE:
+            profile = Profile.objects.filter(pk=job.object_id).first()
+            if profile is not None and profile.photo:
+                generate_profile_variants(profile)
+    except Exception as e:
+        # Anything Pillow raises on a bad upload, e.g. DecompressionBombError,
+        # fails the job rather than the worker.
+        job.error = f'{type(e).__name__}: {e}'
+        if job.attempts < settings.IMAGE_JOB_MAX_ATTEMPTS:
+            job.status = ImageJob.PENDING
+            job.save(update_fields=['status', 'error', 'updated_at'])
+        else:
+            give_up(ImageJob.objects.filter(pk=job.pk), job.error)
+            job.status = ImageJob.FAILED
+        return False
+
+    job.status = ImageJob.DONE
+    job.error = ''
+    job.save(update_fields=['status', 'error', 'updated_at'])
+    return True
@@ -0,0 +1,165 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from users.models import Profile
+from .models import LikedListing, Listing
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS likes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    profile_id INTEGER NOT NULL,
+    listing_id TEXT NOT NULL,
+    liked INTEGER NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS likes_pair ON likes (profile_id, listing_id, id);
+'''
+
+_local = threading.local()
+
+
+def enabled():
+    return bool(settings.LIKE_BUFFER_PATH)
+
+
+def connect():
+    """This thread's connection to the buffer file, created on first use.
+
+    WAL lets request threads append while the flusher reads, and a commit
+    is on disk before the request is answered, so a worker restart loses
+    nothing.
+    """
+    path = settings.LIKE_BUFFER_PATH
+    if not hasattr(_local, 'connections'):
+        _local.connections = {}
+    if path not in _local.connections:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        connection = sqlite3.connect(path, timeout=10, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(SCHEMA)
+        _local.connections[path] = connection
+    return _local.connections[path]
+
+
+def pending_state(profile_id, listing_id):
+    """The latest buffered like state of the pair, or None if nothing is
+    waiting to be flushed for it."""
+    row = connect().execute(
+        'SELECT liked FROM likes WHERE profile_id = ? AND listing_id = ? '
+        'ORDER BY id DESC LIMIT 1', (profile_id, str(listing_id))).fetchone()
+    return None if row is None else bool(row[0])
+
+
+def record(profile_id, listing_id, liked):
+    """Buffer the state the pair should end up in.
+
+    States rather than toggles, so replaying a batch that was applied but
+    not yet removed from the buffer changes nothing.
+    """
+    connect().execute(
+        'INSERT INTO likes (profile_id, listing_id, liked, created) '
+        'VALUES (?, ?, ?, ?)',
+        (profile_id, str(listing_id), int(liked), time.time()))
+
+
+def pending_states(profile_id, listing_ids):
+    """``{listing id: latest buffered state}`` of the given listings."""
+    listing_ids = [str(listing_id) for listing_id in listing_ids]
+    placeholders = ', '.join('?' * len(listing_ids))
+    rows = connect().execute(
+        f'SELECT listing_id, liked FROM likes WHERE profile_id = ? '
+        f'AND listing_id IN ({placeholders}) ORDER BY id',
+        (profile_id, *listing_ids))
+    return {uuid.UUID(listing_id): bool(liked) for listing_id, liked in rows}
+
+
+def lag():
+    """Seconds the oldest buffered event has been waiting, 0 if none.
+
+    The flush lag metric; ``flush_like_buffer --stats`` prints it.
+    """
+    row = connect().execute('SELECT MIN(created) FROM likes').fetchone()
+    return time.time() - row[0] if row[0] is not None else 0.0
+
+
+def pending_count():
+    return connect().execute('SELECT COUNT(*) FROM likes').fetchone()[0]
+
+
+def flush(batch_size=1000):
+    """Apply up to ``batch_size`` buffered events to the database.
+
+    Events are coalesced to the last state per (profile, listing), then
+    applied with one SELECT, one bulk INSERT, one DELETE and one UPDATE of
+    like_count per distinct delta. Returns ``(events, created, deleted,
+    lag)``, where lag is how long the oldest of them waited.
+    """
+    connection = connect()
+    rows = connection.execute(
+        'SELECT id, profile_id, listing_id, liked, created FROM likes '
+        'ORDER BY id LIMIT ?', (batch_size,)).fetchall()
+    if not rows:
+        return 0, 0, 0, 0.0
+
+    wanted = {}
+    for _, profile_id, listing_id, liked, _ in rows:
+        wanted[profile_id, uuid.UUID(listing_id)] = bool(liked)
+    profile_ids = {profile_id for profile_id, _ in wanted}
+    listing_ids = {listing_id for _, listing_id in wanted}
+
+    with transaction.atomic():
+        existing = {
+            (profile_id, listing_id): pk
+            for pk, profile_id, listing_id in LikedListing.objects.filter(
+                profile_id__in=profile_ids, listing_id__in=listing_ids,
+            ).values_list('pk', 'profile_id', 'listing_id')
+        }
+        # Likes of listings or by profiles deleted since the click are
+        # dropped, or their foreign keys would fail the batch every time.
+        live_listings = set(Listing.objects.filter(
+            id__in=listing_ids).values_list('id', flat=True))
+        live_profiles = set(Profile.objects.filter(
+            id__in=profile_ids).values_list('id', flat=True))
+
+        to_create = [
+            LikedListing(profile_id=profile_id, listing_id=listing_id)
+            for (profile_id, listing_id), liked in wanted.items()
+            if liked and (profile_id, listing_id) not in existing
+            and listing_id in live_listings and profile_id in live_profiles
+        ]
+        to_delete = [
+            pair for pair, liked in wanted.items()
+            if not liked and pair in existing
+        ]
+        # A unique conflict with another flusher rolls the whole batch back;
+        # it stays in the buffer and the retry sees the other flusher's rows.
+        LikedListing.objects.bulk_create(to_create)
+        LikedListing.objects.filter(
+            pk__in=[existing[pair] for pair in to_delete]).delete()
+
+        deltas = defaultdict(int)
+        for like in to_create:
+            deltas[like.listing_id] += 1
+        for _, listing_id in to_delete:
+            deltas[listing_id] -= 1
+        by_delta = defaultdict(list)
+        for listing_id, delta in deltas.items():
+            if delta:
+                by_delta[delta].append(listing_id)
+        for delta, ids in by_delta.items():
+            Listing.objects.filter(id__in=ids).update(
+                like_count=Greatest(F('like_count') + delta, Value(0)))
+
+    # Only forgotten once the database has them. A crash in between replays
+    # the batch, which is harmless since the events are states.
+    connection.execute('DELETE FROM likes WHERE id <= ?', (rows[-1][0],))
+    return len(rows), len(to_create), len(to_delete), time.time() - rows[0][4]
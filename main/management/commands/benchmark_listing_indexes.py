@@ -0,0 +1,185 @@
+import contextlib
+import datetime
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import QueryDict
+from django.utils import timezone
+
+from main.consts import CARS_BRANDS, TRANSMISSION_OPTIONS
+from main.filters import ListingFilter
+from main.models import ImageJob, Listing
+from main.pagination import KeysetPaginator
+
+BENCHMARK_USERNAME = 'benchmark_seller_{}'
+BENCHMARK_SELLERS = 50
+
+
+@contextlib.contextmanager
+def explicit_created_at():
+    # bulk_create() would otherwise stamp every seeded row with now().
+    field = Listing._meta.get_field('created_at')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = ('Seed the listings table and compare EXPLAIN plans and timings '
+            'of the feed queries without and with the Listing indexes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Timed runs per query.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the seeded rows afterwards.')
+
+    def handle(self, *args, **options):
+        if Listing._meta.indexes and not self.indexes_exist():
+            raise CommandError('Apply the main migrations before running '
+                               'the benchmark.')
+
+        sellers = self.create_sellers()
+        try:
+            self.seed(sellers, options['rows'], options['batch_size'])
+            queries = self.queries(sellers[0])
+
+            self.drop_indexes()
+            before = self.run(queries, options['repeat'], 'without indexes')
+            self.create_indexes()
+            after = self.run(queries, options['repeat'], 'with indexes')
+
+            self.stdout.write(self.style.MIGRATE_HEADING('\nSummary'))
+            self.stdout.write(f'{"query":<40} {"before":>13} {"after":>13} '
+                              f'{"speedup":>9}')
+            for label in queries:
+                self.stdout.write(
+                    f'{label:<40} {before[label]:>10.2f} ms '
+                    f'{after[label]:>10.2f} ms '
+                    f'{before[label] / max(after[label], 1e-6):>8.1f}x')
+        finally:
+            if not self.indexes_exist():
+                self.create_indexes()
+            if not options['keep']:
+                self.cleanup(sellers, options['batch_size'])
+
+    def create_sellers(self):
+        sellers = []
+        for index in range(BENCHMARK_SELLERS):
+            user, _ = User.objects.get_or_create(
+                username=BENCHMARK_USERNAME.format(index))
+            sellers.append(user.profile)
+        return sellers
+
+    def seed(self, sellers, rows, batch_size):
+        existing = Listing.objects.filter(seller__in=sellers).count()
+        rng = random.Random(42)
+        now = timezone.now()
+        brands = [value for value, _ in CARS_BRANDS]
+        transmissions = [value for value, _ in TRANSMISSION_OPTIONS]
+
+        self.stdout.write(f'Seeding {max(rows - existing, 0)} listings...')
+        with explicit_created_at():
+            for start in range(existing, rows, batch_size):
+                Listing.objects.bulk_create([
+                    Listing(
+                        seller=rng.choice(sellers),
+                        created_at=now - datetime.timedelta(
+                            seconds=rng.randrange(3 * 365 * 24 * 3600)),
+                        brand=rng.choice(brands),
+                        model=f'Benchmark {index}',
+                        vin=f'{index:017d}',
+                        mileage=rng.randrange(300_000),
+                        color='Black',
+                        description='Seeded by benchmark_listing_indexes.',
+                        engine='V8',
+                        transmisson=rng.choice(transmissions),
+                        image='benchmark.jpg',
+                    ) for index in range(start, min(start + batch_size, rows))
+                ])
+        self.analyze()
+
+    def queries(self, seller):
+        def feed(**params):
+            data = QueryDict(mutable=True)
+            data.update(params)
+            queryset = ListingFilter(data, queryset=Listing.objects.feed()).qs
+            paginator = KeysetPaginator(queryset, settings.LISTINGS_PAGE_SIZE)
+            return paginator.queryset.order_by(
+                *paginator.ordering)[:paginator.per_page + 1]
+
+        return {
+            'feed': feed(),
+            'feed brand': feed(brand='porsche'),
+            'feed transmission': feed(transmisson='manual'),
+            'feed brand + transmission': feed(brand='porsche',
+                                              transmisson='manual'),
+            'feed mileage < 10000': feed(mileage__lt='10000'),
+            'profile listings': Listing.objects.filter(
+                seller=seller).order_by('-created_at'),
+        }
+
+    def run(self, queries, repeat, title):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n{title}'))
+        timings = {}
+        for label, queryset in queries.items():
+            runs = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                runs.append((time.perf_counter() - started) * 1000)
+            timings[label] = statistics.median(runs)
+            self.stdout.write(self.style.SQL_KEYWORD(
+                f'{label}: median {timings[label]:.2f} ms, '
+                f'best {min(runs):.2f} ms'))
+            self.stdout.write(queryset.explain())
+        return timings
+
+    def indexes_exist(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, Listing._meta.db_table)
+        return all(index.name in constraints
+                   for index in Listing._meta.indexes)
+
+    def drop_indexes(self):
+        with connection.schema_editor() as editor:
+            for index in Listing._meta.indexes:
+                editor.remove_index(Listing, index)
+        self.analyze()
+
+    def create_indexes(self):
+        with connection.schema_editor() as editor:
+            for index in Listing._meta.indexes:
+                editor.add_index(Listing, index)
+        self.analyze()
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def cleanup(self, sellers, batch_size):
+        self.stdout.write('Removing seeded listings...')
+        # Through the ORM, so the search index, trending scores and events
+        # of the listings go with them. In batches, to keep the deletion
+        # collector from holding every seeded row at once.
+        listings = Listing.objects.filter(seller__in=sellers)
+        while True:
+            batch = list(listings.values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                break
+            Listing.objects.filter(pk__in=batch).delete()
+            # Jobs point at their object by id only, so nothing cascades.
+            ImageJob.objects.filter(
+                kind=ImageJob.LISTING,
+                object_id__in=[str(pk) for pk in batch]).delete()
+        User.objects.filter(profile__in=sellers).delete()
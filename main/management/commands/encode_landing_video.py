@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main.consts import LANDING_VIDEO_RENDITIONS
+
+VIDEOS_DIR = settings.BASE_DIR / 'main' / 'static' / 'videos'
+MANIFEST = 'landing.json'
+
+
+def hashed_copy(path, directory, stem, ext):
+    """Move ``path`` into ``directory`` as ``<stem>.<hash>.<ext>``, so the
+    name can be cached forever."""
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(1 << 20):
+            sha256.update(chunk)
+    digest = sha256.hexdigest()[:12]
+    name = f'{stem}.{digest}.{ext}'
+    shutil.move(path, os.path.join(directory, name))
+    return name
+
+
+class Command(BaseCommand):
+    help = ('Encode the landing page background video into a poster frame '
+            'and lower-bitrate renditions with ffmpeg, and write the '
+            'manifest the landing page reads them from.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', nargs='?',
+                            default=str(VIDEOS_DIR / 'bg.mp4'),
+                            help='Video to encode (default: videos/bg.mp4).')
+        parser.add_argument('--poster-at', type=float, default=1.0,
+                            help='Second of the video used as the poster.')
+
+    def handle(self, *args, **options):
+        ffmpeg = shutil.which('ffmpeg')
+        if ffmpeg is None:
+            raise CommandError('ffmpeg was not found on PATH.')
+        source = options['source']
+        if not os.path.isfile(source):
+            raise CommandError(f'{source} does not exist.')
+        stem = os.path.splitext(os.path.basename(source))[0]
+        os.makedirs(VIDEOS_DIR, exist_ok=True)
+
+        manifest = {'poster': None, 'renditions': []}
+        with tempfile.TemporaryDirectory() as work:
+            poster = os.path.join(work, 'poster.jpg')
+            self.run([ffmpeg, '-y', '-ss', str(options['poster_at']),
+                      '-i', source, '-frames:v', '1', '-vf', 'scale=-2:720',
+                      '-q:v', '5', poster])
+            manifest['poster'] = 'videos/' + hashed_copy(
+                poster, VIDEOS_DIR, f'{stem}-poster', 'jpg')
+
+            for name, height, bitrate, media in LANDING_VIDEO_RENDITIONS:
+                output = os.path.join(work, f'{name}.mp4')
+                # Muted anyway, so the audio track is dropped. faststart puts
+                # the index first, so playback can start after the first
+                # range request instead of the whole file.
+                self.run([ffmpeg, '-y', '-i', source, '-an',
+                          '-vf', f'scale=-2:{height}', '-c:v', 'libx264',
+                          '-preset', 'slow', '-crf', '26',
+                          '-maxrate', bitrate, '-bufsize', bitrate,
+                          '-pix_fmt', 'yuv420p', '-movflags', '+faststart',
+                          output])
+                size = os.path.getsize(output)
+                manifest['renditions'].append({
+                    'src': 'videos/' + hashed_copy(
+                        output, VIDEOS_DIR, f'{stem}-{name}', 'mp4'),
+                    'media': media,
+                })
+                self.stdout.write(f'{name}: {size:,} bytes')
+
+        with open(VIDEOS_DIR / MANIFEST, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {VIDEOS_DIR / MANIFEST}. Old renditions can be deleted.'))
+
+    def run(self, command):
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode:
+            lines = result.stderr.strip().splitlines()
+            raise CommandError(lines[-1] if lines else
+                               f'ffmpeg exited with status {result.returncode}.')
@@ -0,0 +1,55 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from main import likebuffer
+
+
+class Command(BaseCommand):
+    help = ('Apply likes buffered in LIKE_BUFFER_PATH to the database, '
+            'coalescing repeated clicks on the same listing.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the buffer is empty instead of polling.')
+        parser.add_argument('--interval', type=float,
+                            default=settings.LIKE_BUFFER_FLUSH_INTERVAL,
+                            help='Seconds to sleep when the buffer is empty.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Buffered events applied per transaction.')
+        parser.add_argument('--stats', action='store_true',
+                            help='Print the number of buffered events and how long '
+                                 'the oldest has waited, then exit.')
+
+    def handle(self, *args, **options):
+        if not likebuffer.enabled():
+            raise CommandError('LIKE_BUFFER_PATH is not set.')
+        if options['stats']:
+            self.stdout.write(f'pending={likebuffer.pending_count()} '
+                              f'lag={likebuffer.lag():.2f}s')
+            return
+        try:
+            while True:
+                try:
+                    events, created, deleted, lag = likebuffer.flush(
+                        options['batch_size'])
+                except DatabaseError as e:
+                    # The batch stays buffered; keep the flusher alive and
+                    # try again after the interval.
+                    self.stderr.write(f'Flush failed: {e}')
+                    if options['once']:
+                        return
+                    time.sleep(options['interval'])
+                    continue
+                if events:
+                    self.stdout.write(
+                        f'{events} events: +{created} -{deleted} '
+                        f'lag={lag:.2f}s')
+                if events < options['batch_size']:
+                    if options['once']:
+                        return
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
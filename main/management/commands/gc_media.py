@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from array import array
+from bisect import bisect_left
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from main.models import MEDIA_FIELDS
+
+
+def fingerprint(name):
+    return int.from_bytes(
+        hashlib.blake2b(name.encode(), digest_size=8).digest(), 'big')
+
+
+class ReferencedNames:
+    """The set of referenced media names, as a sorted array of 64-bit
+    fingerprints: 8 bytes per name however long the names are.
+
+    A fingerprint collision can only make an orphan look referenced, so
+    it never causes a referenced file to be deleted.
+    """
+
+    def __init__(self, names):
+        self.fingerprints = array('Q', sorted(map(fingerprint, names)))
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def __contains__(self, name):
+        value = fingerprint(name)
+        index = bisect_left(self.fingerprints, value)
+        return (index < len(self.fingerprints)
+                and self.fingerprints[index] == value)
+
+
+def referenced_names(batch_size):
+    for model, file_fields, variants_field in MEDIA_FIELDS:
+        rows = model.objects.values_list(
+            *file_fields, variants_field,
+        ).order_by().iterator(chunk_size=batch_size)
+        for *names, variants in rows:
+            yield from filter(None, names)
+            for by_format in (variants or {}).values():
+                yield from by_format.values()
+
+
+def walk(root, skip):
+    """Yield ``(relative name, DirEntry)`` for every file under ``root``,
+    one directory listing in memory at a time."""
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.path != skip:
+                        stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    name = os.path.relpath(entry.path, root)
+                    yield name.replace(os.sep, '/'), entry
+
+
+class Command(BaseCommand):
+    help = ('Delete or quarantine media files that no listing or profile '
+            'refers to any more.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report the files that would be removed.')
+        parser.add_argument('--quarantine', metavar='DIR',
+                            help='Move orphans into DIR instead of deleting them.')
+        parser.add_argument('--min-age', type=float, default=24,
+                            help='Hours a file must be unmodified before it is '
+                                 'removed, so uploads still being saved are '
+                                 'left alone.')
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Rows read per query.')
+
+    def handle(self, *args, **options):
+        root = os.path.abspath(default_storage.location)
+        quarantine = options['quarantine'] and os.path.abspath(options['quarantine'])
+        if quarantine == root:
+            raise CommandError('The quarantine cannot be MEDIA_ROOT itself.')
+        cutoff = time.time() - options['min_age'] * 3600
+
+        referenced = ReferencedNames(referenced_names(options['batch_size']))
+        self.stdout.write(f'{len(referenced)} referenced files.')
+
+        # Candidates go to a temporary file, one JSON string per line, so
+        # memory does not grow with the number of orphans either.
+        with tempfile.TemporaryFile('w+', encoding='utf-8') as candidates:
+            scanned = found = 0
+            for name, entry in walk(root, skip=quarantine):
+                scanned += 1
+                if name in referenced:
+                    continue
+                if entry.stat(follow_symlinks=False).st_mtime > cutoff:
+                    continue
+                candidates.write(json.dumps(name) + '\n')
+                found += 1
+
+            # Rows saved and identical bytes re-uploaded during the walk
+            # refer to, or touch, files that looked orphaned above. Look
+            # again before removing anything.
+            if found:
+                referenced = ReferencedNames(
+                    referenced_names(options['batch_size']))
+            candidates.seek(0)
+            orphans, orphan_bytes = self.remove(
+                map(json.loads, candidates), root, referenced, cutoff,
+                quarantine, options['dry_run'])
+
+        action = ('Would remove' if options['dry_run'] else
+                  'Quarantined' if quarantine else 'Deleted')
+        self.stdout.write(self.style.SUCCESS(
+            f'Scanned {scanned} files. {action} {orphans} orphans '
+            f'({orphan_bytes:,} bytes).'))
+
+    def remove(self, names, root, referenced, cutoff, quarantine, dry_run):
+        orphans = orphan_bytes = 0
+        for name in names:
+            if name in referenced:
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path, follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime > cutoff:
+                continue
+            orphans += 1
+            orphan_bytes += stat.st_size
+            if dry_run:
+                self.stdout.write(name)
+            elif quarantine:
+                target = os.path.join(quarantine, name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.move(path, target)
+            else:
+                os.remove(path)
+        return orphans, orphan_bytes
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from main.cache import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = 'Print hit/miss counters of the listings result cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true',
+                            help='Reset the counters after printing them.')
+
+    def handle(self, *args, **options):
+        stats = get_stats()
+        lookups = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / lookups if lookups else 0
+        self.stdout.write(
+            f"hits={stats['hits']} misses={stats['misses']} hit_ratio={ratio:.2%}")
+        if options['reset']:
+            reset_stats()
@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from main.jobs import claim_next_job, requeue_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = ('Run queued image jobs: resize and re-encode new listing images '
+            'and profile photos in the background.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is empty instead of polling.')
+        parser.add_argument('--poll-interval', type=float,
+                            default=settings.IMAGE_JOB_POLL_INTERVAL,
+                            help='Seconds to sleep when the queue is empty.')
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                requeue_stale_jobs()
+                job = claim_next_job()
+                if job is None:
+                    if options['once']:
+                        return
+                    time.sleep(options['poll_interval'])
+                    continue
+                started = time.monotonic()
+                if run_job(job):
+                    self.stdout.write(
+                        f'{job} in {time.monotonic() - started:.2f}s')
+                else:
+                    self.stderr.write(f'{job} attempt {job.attempts}: {job.error}')
+        except KeyboardInterrupt:
+            pass
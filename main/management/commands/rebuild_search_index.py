@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = ('Rebuild the listing search index from scratch, e.g. after bulk '
+            'imports that bypassed save().')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt.'))
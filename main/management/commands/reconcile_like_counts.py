@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from main.models import LikedListing, Listing
+
+
+def actual_like_count():
+    return Coalesce(Subquery(
+        LikedListing.objects.filter(listing=OuterRef('pk')).order_by()
+        .values('listing').annotate(count=Count('id')).values('count'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = ('Recompute Listing.like_count from LikedListing and fix any '
+            'listing whose stored count has drifted.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report the drifted listings.')
+
+    def handle(self, *args, **options):
+        drifted = Listing.objects.exclude(like_count=actual_like_count())
+        if options['verbosity'] > 1:
+            for listing_id, like_count, actual in drifted.annotate(
+                    actual=actual_like_count()).values_list(
+                    'id', 'like_count', 'actual'):
+                self.stdout.write(f'{listing_id}: {like_count} -> {actual}')
+        if options['dry_run']:
+            count = drifted.count()
+        else:
+            # Counted and written by the same statement, so likes made
+            # while it runs are not overwritten with an older count.
+            # update() skips save(), so updated_at and the feed cache are
+            # left alone.
+            count = drifted.update(like_count=actual_like_count())
+        self.stdout.write(self.style.SUCCESS(
+            f'{count} listings '
+            f'{"have drifted" if options["dry_run"] else "fixed"}.'))
@@ -0,0 +1,82 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from main.cache import bump_generation
+from main.models import MEDIA_FIELDS
+from main.storage import content_hash, hashed_name, is_content_addressed
+
+
+class Command(BaseCommand):
+    help = ('Move media saved under the old user_<id>/ paths to content-hashed '
+            'names and rewrite the image/photo columns that point at them.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would be moved without writing.')
+        parser.add_argument('--delete-old', action='store_true',
+                            help='Delete the old files once every row is updated.')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Rows read per query.')
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        # Old name -> new name, so a file referenced twice is hashed once.
+        self.renamed = {}
+        self.missing = self.rows = 0
+
+        for model, file_fields, variants_field in MEDIA_FIELDS:
+            rows = model.objects.values_list(
+                'pk', *file_fields, variants_field,
+            ).order_by().iterator(chunk_size=options['batch_size'])
+            for pk, *names, variants in rows:
+                self.rehash_row(model, pk, dict(zip(file_fields, names)),
+                                variants_field, variants)
+
+        if self.rows and not self.dry_run:
+            bump_generation()
+        if options['delete_old'] and not self.dry_run:
+            for old_name in self.renamed:
+                default_storage.delete(old_name)
+
+        deduplicated = len(self.renamed) - len(set(self.renamed.values()))
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Would rewrite" if self.dry_run else "Rewrote"} {self.rows} '
+            f'rows, {len(self.renamed)} files ({deduplicated} duplicates), '
+            f'{self.missing} missing.'))
+
+    def rehash_row(self, model, pk, names, variants_field, variants):
+        changes = {}
+        for field, name in names.items():
+            new_name = self.rehash(name)
+            if new_name != name:
+                changes[field] = new_name
+
+        new_variants = {
+            size: {fmt: self.rehash(name) for fmt, name in by_format.items()}
+            for size, by_format in (variants or {}).items()}
+        if new_variants != (variants or {}):
+            changes[variants_field] = new_variants
+
+        if changes:
+            self.rows += 1
+            if not self.dry_run:
+                # update() leaves updated_at and the cache alone; the cache
+                # is invalidated once at the end.
+                model.objects.filter(pk=pk).update(**changes)
+
+    def rehash(self, name):
+        if not name or is_content_addressed(name):
+            return name
+        if name in self.renamed:
+            return self.renamed[name]
+        if not default_storage.exists(name):
+            self.missing += 1
+            self.stderr.write(f'Missing: {name}')
+            return name
+        with default_storage.open(name) as content:
+            if self.dry_run:
+                new_name = hashed_name(content_hash(content), name)
+            else:
+                new_name = default_storage.save(name, content)
+        self.renamed[name] = new_name
+        return new_name
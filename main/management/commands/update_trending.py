@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from main.trending import ingest, prune
+
+
+class Command(BaseCommand):
+    help = ('Fold new likes, views and inquiries into the trending scores '
+            'and drop the scores that have decayed away.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once everything is ingested instead of polling.')
+        parser.add_argument('--poll-interval', type=float,
+                            default=settings.TRENDING_POLL_INTERVAL,
+                            help='Seconds to sleep when there is nothing new.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Likes and events read per transaction.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        try:
+            while True:
+                likes, events = ingest(batch_size)
+                if likes or events:
+                    self.stdout.write(f'{likes} likes, {events} events')
+                if likes < batch_size and events < batch_size:
+                    pruned = prune()
+                    if pruned:
+                        self.stdout.write(f'{pruned} scores pruned')
+                    if options['once']:
+                        return
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
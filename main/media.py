@@ -0,0 +1,220 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+from PIL import Image
+
+from .resize import get_resized, negotiate_format
+from .storage import HASHED_NAME_RE
+
+mimetypes.add_type('image/avif', '.avif')
+mimetypes.add_type('image/webp', '.webp')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeFile:
+    """Read at most ``length`` bytes of ``file`` from its current position.
+
+    ``fileno()`` is passed through so gunicorn's ``wsgi.file_wrapper`` can
+    still sendfile() the range: it sends Content-Length bytes from the
+    descriptor's current offset.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """Parse a Range header into an inclusive ``(start, end)``.
+
+    Returns None when the whole file should be sent instead, i.e. for
+    malformed or multi-part ranges, and raises ValueError when the range
+    cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if start:
+        start = int(start)
+        if end and int(end) < start:
+            return None
+        end = min(int(end), size - 1) if end else size - 1
+    else:
+        # "bytes=-N" is the last N bytes.
+        start, end = max(size - int(end), 0), size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, end
+
+
+def range_applies(request, etag, last_modified):
+    """Whether an If-Range precondition, if any, still matches the file."""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def stat_media(path):
+    """Absolute path and stat of a file under MEDIA_ROOT, or a 404."""
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404('File not found.')
+    if not os.path.isfile(full_path):
+        raise Http404('File not found.')
+    return full_path, stat
+
+
+def cache_control(path):
+    if HASHED_NAME_RE.match(path):
+        return IMMUTABLE
+    return f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve a file from MEDIA_ROOT.
+
+    Content-hashed names are cached forever; anything else for
+    MEDIA_CACHE_MAX_AGE seconds. With MEDIA_ACCEL_REDIRECT set, only
+    headers are sent and nginx is told to serve the file from that
+    internal location.
+    """
+    full_path, stat = stat_media(path)
+    hashed = HASHED_NAME_RE.match(path)
+    # The content hash is a strong validator; otherwise use mtime and size.
+    etag = (f'"{hashed.group(1)}"' if hashed
+            else f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"')
+    accel_redirect = (settings.MEDIA_ACCEL_REDIRECT + path
+                      if settings.MEDIA_ACCEL_REDIRECT else None)
+    return send_file(request, full_path, stat, etag, cache_control(path),
+                     accel_redirect=accel_redirect)
+
+
+@require_safe
+def resize_media(request, width, path):
+    """Serve a file from MEDIA_ROOT scaled down to ``width`` pixels wide,
+    in the best format the client accepts.
+
+    Resized copies are kept in a disk cache capped at
+    RESIZE_CACHE_MAX_BYTES, least recently used first out.
+    """
+    if not 0 < width <= settings.RESIZE_MAX_WIDTH:
+        raise Http404('Unsupported width.')
+    source_path, source_stat = stat_media(path)
+    fmt = negotiate_format(request.headers.get('Accept', ''))
+    for _ in range(2):
+        try:
+            full_path = get_resized(source_path, source_stat, width, fmt)
+        except Image.DecompressionBombError:
+            return HttpResponse('Image too large to resize.', status=422,
+                                content_type='text/plain')
+        except (OSError, ValueError, SyntaxError):
+            raise Http404('Not an image.')
+        try:
+            # Opened here, so a sweep evicting it from now on cannot pull
+            # it from under the response.
+            file = open(full_path, 'rb')
+            break
+        except FileNotFoundError:
+            # Evicted between being rendered and opened: render it again.
+            continue
+    else:
+        raise Http404('File not found.')
+    stat = os.fstat(file.fileno())
+    # The cache file is named by a hash of everything it depends on.
+    etag = f'"{os.path.basename(full_path).split(".")[0]}"'
+    response = send_file(request, full_path, stat, etag, cache_control(path),
+                         file=file)
+    if not isinstance(response, FileResponse):
+        file.close()
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+def send_file(request, full_path, stat, etag, cache_control,
+              accel_redirect=None, file=None):
+    """Answer conditional and single Range requests for ``full_path``.
+
+    The body is a FileResponse so gunicorn can send it with sendfile(),
+    read from ``file`` if the caller already opened it.
+    """
+    last_modified = int(stat.st_mtime)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': cache_control,
+        'Accept-Ranges': 'bytes',
+    }
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    not_modified = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        for header, value in headers.items():
+            not_modified[header] = value
+        return not_modified
+
+    if accel_redirect:
+        # nginx handles Range itself for internal redirects.
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response['X-Accel-Redirect'] = accel_redirect
+        return response
+
+    start, end = 0, stat.st_size - 1
+    status = 200
+    if 'Range' in request.headers and range_applies(request, etag, last_modified):
+        try:
+            byte_range = parse_range(request.headers['Range'], stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416, headers=headers)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+        if byte_range is not None:
+            start, end = byte_range
+            status = 206
+    length = end - start + 1
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type, status=status,
+                                headers=headers)
+    else:
+        file = file or open(full_path, 'rb')
+        file.seek(start)
+        response = FileResponse(RangeFile(file, length), status=status,
+                                content_type=content_type, headers=headers)
+    response['Content-Length'] = length
+    if encoding:
+        response['Content-Encoding'] = encoding
+    if status == 206:
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    return response
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.3 on 2026-10-18 04:39
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE main_listing_fts USING fts5("
+            "model, description, engine, color, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')")
+        schema_editor.execute(
+            "INSERT INTO main_listing_fts "
+            "(rowid, model, description, engine, color) "
+            "SELECT rowid, model, description, engine, color FROM main_listing")
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE INDEX listing_search_vector_idx ON main_listing "
+            "USING gin (search_vector)")
+        schema_editor.execute(
+            "UPDATE main_listing SET search_vector = "
+            "setweight(to_tsvector('english', coalesce(model, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(engine, '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(color, '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'C')")
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS main_listing_fts")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS listing_search_vector_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
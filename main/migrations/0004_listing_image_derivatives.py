@@ -0,0 +1,29 @@
+# Generated by Django 5.2.3 on 2026-10-18 04:45
+
+import main.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_listing_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='image_card',
+            field=models.ImageField(blank=True, editable=False, upload_to=main.utils.user_listing_path),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='image_detail',
+            field=models.ImageField(blank=True, editable=False, upload_to=main.utils.user_listing_path),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='image_full',
+            field=models.ImageField(blank=True, editable=False, upload_to=main.utils.user_listing_path),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 04:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_listing_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
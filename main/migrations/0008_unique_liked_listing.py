@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-18 05:09
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_likes(apps, schema_editor):
+    # Keep the first like of every (profile, listing) pair.
+    LikedListing = apps.get_model('main', 'LikedListing')
+    first_likes = LikedListing.objects.values(
+        'profile', 'listing').annotate(first_id=Min('id')).values('first_id')
+    LikedListing.objects.exclude(id__in=first_likes).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_image_metadata'),
+        ('users', '0004_photo_metadata'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_likes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='likedlisting',
+            constraint=models.UniqueConstraint(fields=('profile', 'listing'), name='unique_profile_listing_like'),
+        ),
+    ]
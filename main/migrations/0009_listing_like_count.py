@@ -0,0 +1,35 @@
+# Generated by Django 5.2.3 on 2026-10-18 05:11
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_likes(apps, schema_editor):
+    Listing = apps.get_model('main', 'Listing')
+    LikedListing = apps.get_model('main', 'LikedListing')
+    counts = LikedListing.objects.values_list('listing').annotate(
+        count=Count('id')).order_by()
+    listings = [Listing(id=listing_id, like_count=count)
+                for listing_id, count in counts]
+    Listing.objects.bulk_update(listings, ['like_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_unique_liked_listing'),
+        ('users', '0004_photo_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_likes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['-like_count', '-created_at', '-id'], name='listing_popular_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.3 on 2026-10-18 05:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_trending'),
+        ('users', '0004_photo_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingLike',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('counted_at', models.DateTimeField()),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.listing')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.profile')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('profile', 'listing'), name='unique_trending_like')],
+            },
+        ),
+    ]
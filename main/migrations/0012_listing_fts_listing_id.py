@@ -0,0 +1,42 @@
+from django.db import migrations
+
+FTS_COLUMNS = "model, description, engine, color"
+
+
+def key_on_listing_id(apps, schema_editor):
+    # rowid of a table with a UUID primary key is not stable: VACUUM may
+    # renumber it. Store the listing id in the index instead.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS main_listing_fts")
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE main_listing_fts USING fts5("
+        f"{FTS_COLUMNS}, listing_id UNINDEXED, "
+        f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')")
+    schema_editor.execute(
+        f"INSERT INTO main_listing_fts ({FTS_COLUMNS}, listing_id) "
+        f"SELECT {FTS_COLUMNS}, id FROM main_listing")
+
+
+def key_on_rowid(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS main_listing_fts")
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE main_listing_fts USING fts5("
+        f"{FTS_COLUMNS}, "
+        f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')")
+    schema_editor.execute(
+        f"INSERT INTO main_listing_fts (rowid, {FTS_COLUMNS}) "
+        f"SELECT rowid, {FTS_COLUMNS} FROM main_listing")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_trending_like'),
+    ]
+
+    operations = [
+        migrations.RunPython(key_on_listing_id, key_on_rowid),
+    ]
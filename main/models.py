@@ -1,4 +1,5 @@
 import uuid
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
 from .consts import CARS_BRANDS, TRANSMISSION_OPTIONS
@@ -6,6 +7,38 @@ from users.models import Profile, Location
 from .utils import user_listing_path
 
 
+class ListingQuerySet(models.QuerySet):
+
+    def feed(self):
+        """Listings with everything a feed card renders, in one query."""
+        return self.select_related('seller__user', 'location').only(
+            'id', 'created_at', 'updated_at', 'brand', 'model', 'mileage',
+            'description', 'transmisson', 'image', 'image_card',
+            'image_detail', 'image_full', 'image_variants', 'images_pending',
+            'image_width', 'image_height', 'image_color', 'image_placeholder',
+            'like_count',
+            'seller', 'seller__photo', 'seller__photo_avatar',
+            'seller__photo_variants', 'seller__photo_color', 'seller__user',
+            'seller__user__username',
+            'location', 'location__city', 'location__state',
+        )
+
+    def with_liked_by(self, user):
+        """Annotate whether ``user`` likes each listing as ``is_liked``.
+
+        An EXISTS per fetched row, answered from the unique (profile,
+        listing) index, in the same query as the listings themselves.
+        """
+        return self.annotate(is_liked=models.Exists(
+            LikedListing.objects.filter(
+                profile__user=user, listing=models.OuterRef('pk'))))
+
+    def trending(self):
+        """Listings with a trending score, annotated as ``trending_score``."""
+        return self.filter(trending__isnull=False).annotate(
+            trending_score=models.F('trending__score'))
+
+
 class Listing(models.Model):
     id = models.UUIDField(
         primary_key=True, default=uuid.uuid4, unique=True, editable=False)
@@ -24,15 +57,184 @@ class Listing(models.Model):
     location = models.OneToOneField(
         Location, on_delete=models.SET_NULL, null=True)
     image = models.ImageField(upload_to=user_listing_path)
+    # Resized copies of image, see main.images.
+    image_card = models.ImageField(
+        upload_to=user_listing_path, blank=True, editable=False)
+    image_detail = models.ImageField(
+        upload_to=user_listing_path, blank=True, editable=False)
+    image_full = models.ImageField(
+        upload_to=user_listing_path, blank=True, editable=False)
+    # WebP/AVIF copies of each size: {size: {format: name}}.
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # Upright size, most common colour and an inline blurred copy of image,
+    # so templates never have to open the file.
+    image_width = models.PositiveIntegerField(
+        null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(
+        null=True, blank=True, editable=False)
+    image_color = models.CharField(max_length=7, blank=True, editable=False)
+    image_placeholder = models.TextField(blank=True, editable=False)
+    # Set while an ImageJob is rendering the copies above for a new image.
+    images_pending = models.BooleanField(default=False, editable=False)
+    # Number of LikedListing rows, kept up to date by the like toggle and
+    # reconcile_like_counts.
+    like_count = models.PositiveIntegerField(default=0, editable=False)
+    # Only populated on PostgreSQL; SQLite searches main_listing_fts instead.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ListingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Feed order, alone and behind each exact-match filter.
+            models.Index(fields=['-created_at', '-id'],
+                         name='listing_feed_idx'),
+            models.Index(fields=['brand', '-created_at', '-id'],
+                         name='listing_brand_feed_idx'),
+            models.Index(fields=['transmisson', '-created_at', '-id'],
+                         name='listing_trans_feed_idx'),
+            models.Index(fields=['brand', 'transmisson', '-created_at', '-id'],
+                         name='listing_brand_trans_feed_idx'),
+            models.Index(fields=['mileage'], name='listing_mileage_idx'),
+            # Popular sort.
+            models.Index(fields=['-like_count', '-created_at', '-id'],
+                         name='listing_popular_idx'),
+            # Profile page: a seller's own listings, newest first.
+            models.Index(fields=['seller', '-created_at'],
+                         name='listing_seller_created_idx'),
+        ]
 
     def __str__(self):
         return f'{self.seller.user.username}\'s Listing - {self.model}'
 
+    @property
+    def full_image(self):
+        return self.image_full or self.image
+
 
 class LikedListing(models.Model):
     profile = models.ForeignKey(Profile, on_delete=models.CASCADE)
     listing = models.ForeignKey(Listing, on_delete=models.CASCADE)
     like_date = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            # Also the index the like toggle looks rows up by.
+            models.UniqueConstraint(fields=['profile', 'listing'],
+                                    name='unique_profile_listing_like'),
+        ]
+
+    def __str__(self):
+        return f'{self.listing.model} listing liked by {self.profile.user.username}'
+
+
+# Every model with uploaded files: the model, its file fields and its JSON
+# field of {size: {format: name}}.
+MEDIA_FIELDS = (
+    (Listing, ('image', 'image_card', 'image_detail', 'image_full'),
+     'image_variants'),
+    (Profile, ('photo', 'photo_avatar'), 'photo_variants'),
+)
+
+
+class ImageJob(models.Model):
+    """A listing image or profile photo waiting to be resized and
+    re-encoded by the ``process_image_jobs`` worker."""
+    LISTING = 'listing'
+    PROFILE = 'profile'
+    KIND_CHOICES = ((LISTING, 'Listing image'), (PROFILE, 'Profile photo'))
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = ((PENDING, 'Pending'), (RUNNING, 'Running'),
+                      (DONE, 'Done'), (FAILED, 'Failed'))
+
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    # Listing ids are UUIDs and profile ids integers, so store either as text.
+    object_id = models.CharField(max_length=36)
+    status = models.CharField(
+        max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # The worker polls for the oldest pending job.
+            models.Index(fields=['status', 'created_at'],
+                         name='imagejob_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.object_id} ({self.status})'
+
+
+class ListingEvent(models.Model):
+    """A view or inquiry waiting to be folded into the trending scores.
+
+    Rows are deleted as update_trending ingests them.
+    """
+    VIEW = 'view'
+    INQUIRY = 'inquiry'
+    KIND_CHOICES = ((VIEW, 'View'), (INQUIRY, 'Inquiry'))
+
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.get_kind_display()} of {self.listing_id}'
+
+
+class TrendingScore(models.Model):
+    """Time-decayed engagement of a listing, see main.trending.
+
+    The score is stored in log-space relative to a fixed epoch, so it never
+    has to be rewritten as time passes and its order is the trending order.
+    """
+    listing = models.OneToOneField(
+        Listing, on_delete=models.CASCADE, primary_key=True,
+        related_name='trending')
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [
+            # Trending sort; the top N is a walk down this index.
+            models.Index(fields=['-score', '-listing'],
+                         name='trending_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.listing_id}: {self.score:.3f}'
+
+
+class TrendingLike(models.Model):
+    """When a profile's like of a listing last counted towards its score.
+
+    Unliking deletes the LikedListing row and liking again creates a new
+    one, so without this every toggle would count as another like.
+    """
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE)
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE)
+    counted_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['profile', 'listing'],
+                                    name='unique_trending_like'),
+        ]
+
+    def __str__(self):
+        return f'{self.profile_id} liked {self.listing_id} at {self.counted_at}'
+
+
+class TrendingCheckpoint(models.Model):
+    """The last row of an append-only source folded into the scores."""
+    source = models.CharField(max_length=32, primary_key=True)
+    position = models.BigIntegerField(default=0)
+
     def __str__(self):
-        return f'{self.listing.model} listing liked by {self.profile.user.username}'
\ No newline at end of file
+        return f'{self.source} @ {self.position}'
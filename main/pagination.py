@@ -0,0 +1,145 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder rounds datetimes to milliseconds, which would make
+    # the seek skip or repeat rows created within the same millisecond.
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPage:
+    """A single page of a keyset paginated queryset.
+
+    Cursors are opaque tokens encoding the ordering values of the first and
+    last row, so the next fetch seeks straight to them instead of counting
+    past every earlier row like OFFSET does.
+    """
+
+    def __init__(self, paginator, object_list, has_next, has_previous):
+        self.paginator = paginator
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def next_cursor(self):
+        if self.has_next and self.object_list:
+            return self.paginator.encode_cursor(self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous and self.object_list:
+            return self.paginator.encode_cursor(self.object_list[0])
+        return None
+
+
+class KeysetPaginator:
+    """Paginate a queryset on a unique ordering, e.g. ``(-created_at, -id)``.
+
+    The last ordering field must be unique so that every row has a distinct
+    position in the sequence.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-created_at', '-id')):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = [(name.lstrip('-'), name.startswith('-'))
+                       for name in self.ordering]
+
+    def get_page(self, after=None, before=None):
+        """Return the page after/before the given cursor.
+
+        Like ``Paginator.get_page()`` this never fails on user input: an
+        invalid cursor falls back to the first page.
+        """
+        try:
+            if before:
+                return self.page_before(self.decode_cursor(before))
+            if after:
+                return self.page_after(self.decode_cursor(after))
+        except InvalidCursor:
+            pass
+        return self.page_after(None)
+
+    def page_after(self, values):
+        queryset = self.queryset.order_by(*self.ordering)
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, reverse=False))
+        rows = list(queryset[:self.per_page + 1])
+        return KeysetPage(self, rows[:self.per_page],
+                          has_next=len(rows) > self.per_page,
+                          has_previous=values is not None)
+
+    def page_before(self, values):
+        queryset = self.queryset.order_by(*self._reversed_ordering())
+        queryset = queryset.filter(self._seek(values, reverse=True))
+        rows = list(queryset[:self.per_page + 1])
+        object_list = rows[:self.per_page]
+        object_list.reverse()
+        return KeysetPage(self, object_list, has_next=True,
+                          has_previous=len(rows) > self.per_page)
+
+    def encode_cursor(self, obj):
+        values = [getattr(obj, name) for name, _ in self.fields]
+        payload = json.dumps(values, cls=CursorEncoder,
+                             separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (binascii.Error, ValueError, UnicodeError):
+            raise InvalidCursor(cursor)
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise InvalidCursor(cursor)
+        try:
+            return [self._to_python(name, value)
+                    for (name, _), value in zip(self.fields, values)]
+        except ValidationError:
+            raise InvalidCursor(cursor)
+
+    def _seek(self, values, reverse):
+        # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y)
+        condition = Q()
+        for index, (name, descending) in enumerate(self.fields):
+            lookup = 'lt' if descending != reverse else 'gt'
+            step = Q(**{f'{name}__{lookup}': values[index]})
+            for prev_index, (prev_name, _) in enumerate(self.fields[:index]):
+                step &= Q(**{prev_name: values[prev_index]})
+            condition |= step
+        return condition
+
+    def _reversed_ordering(self):
+        return tuple(name[1:] if name.startswith('-') else f'-{name}'
+                     for name in self.ordering)
+
+    def _to_python(self, name, value):
+        try:
+            field = self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotations (e.g. a search rank) are stored as plain JSON.
+            return value
+        return field.to_python(value)
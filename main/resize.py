@@ -0,0 +1,148 @@
+import hashlib
+import os
+import time
+import uuid
+
+from django.conf import settings
+from django.core.files import File, locks
+
+from .images import encode, modern_formats, open_image, resize
+
+SWEEP_MARKER = '.last-sweep'
+
+
+def negotiate_format(accept):
+    """The best format the client accepts, JPEG for everyone else."""
+    for fmt in modern_formats():
+        if f'image/{fmt}' in accept:
+            return fmt
+    return 'jpeg'
+
+
+def cache_path(source_path, stat, width, fmt):
+    # Keyed on the source's mtime and size too, so replacing a file under
+    # the same name never serves a stale resize.
+    key = hashlib.sha256(
+        f'{source_path}|{stat.st_mtime_ns}|{stat.st_size}|{width}|{fmt}'.encode()
+    ).hexdigest()
+    return os.path.join(settings.RESIZE_CACHE_DIR, key[:2], f'{key}.{fmt}')
+
+
+def render(source_path, target, width, fmt):
+    image, _ = open_image(File(open(source_path, 'rb')), (width, width))
+    content = encode(resize(image, (width, image.height)), fmt)
+    temp = f'{target}.{uuid.uuid4().hex}.tmp'
+    with open(temp, 'wb') as f:
+        for chunk in content.chunks():
+            f.write(chunk)
+    os.replace(temp, target)
+
+
+def get_resized(source_path, stat, width, fmt):
+    """Path of ``source_path`` resized to ``width`` in ``fmt``, rendering it
+    into the cache if needed.
+
+    Workers that miss on the same variant at once wait on a lock file, and
+    only the first renders it; the others find it in the cache when the
+    lock is released.
+    """
+    target = cache_path(source_path, stat, width, fmt)
+    if os.path.exists(target):
+        touch(target)
+        return target
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    rendered = False
+    with open(f'{target}.lock', 'ab') as lock_file:
+        locks.lock(lock_file, locks.LOCK_EX)
+        try:
+            if not os.path.exists(target):
+                render(source_path, target, width, fmt)
+                rendered = True
+        finally:
+            locks.unlock(lock_file)
+    if rendered:
+        maybe_sweep()
+    else:
+        touch(target)
+    return target
+
+
+def touch(path):
+    # mtime is the last use; atime is unreliable on noatime mounts.
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+
+def maybe_sweep():
+    """Evict least recently used files once the cache is over its cap,
+    checking at most every RESIZE_CACHE_SWEEP_INTERVAL seconds."""
+    marker = os.path.join(settings.RESIZE_CACHE_DIR, SWEEP_MARKER)
+    try:
+        last_sweep = os.path.getmtime(marker)
+    except FileNotFoundError:
+        last_sweep = 0
+    if time.time() - last_sweep < settings.RESIZE_CACHE_SWEEP_INTERVAL:
+        return
+    with open(marker, 'ab') as marker_file:
+        # Another worker is already sweeping.
+        if not locks.lock(marker_file, locks.LOCK_EX | locks.LOCK_NB):
+            return
+        try:
+            os.utime(marker)
+            sweep(settings.RESIZE_CACHE_DIR, settings.RESIZE_CACHE_MAX_BYTES)
+        finally:
+            locks.unlock(marker_file)
+
+
+def remove_idle_lock(path):
+    """Delete a render lock file, unless a worker is holding it."""
+    try:
+        lock_file = open(path, 'ab')
+    except FileNotFoundError:
+        return
+    with lock_file:
+        if not locks.lock(lock_file, locks.LOCK_EX | locks.LOCK_NB):
+            return
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        finally:
+            locks.unlock(lock_file)
+
+
+def sweep(directory, max_bytes):
+    """Delete the least recently used files until the cache fits in 90% of
+    ``max_bytes``. Returns the number of files deleted."""
+    entries = []
+    total = 0
+    for shard in os.scandir(directory):
+        if not shard.is_dir():
+            continue
+        for entry in os.scandir(shard.path):
+            stat = entry.stat()
+            if entry.name.endswith('.lock'):
+                # Only needed while a render is running.
+                if time.time() - stat.st_mtime > 3600:
+                    remove_idle_lock(entry.path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+    if total <= max_bytes:
+        return 0
+
+    entries.sort()
+    deleted = 0
+    for _, size, path in entries:
+        if total <= max_bytes * 0.9:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        deleted += 1
+    return deleted
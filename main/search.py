@@ -0,0 +1,182 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Expression, F, FloatField, Q, Value
+from django.db.models.sql.constants import INNER
+
+from .models import Listing
+
+FTS_TABLE = 'main_listing_fts'
+SEARCH_CONFIG = 'english'
+
+# Column weights: a hit in the model name counts most, the description least.
+SEARCH_VECTOR = (
+    SearchVector('model', weight='A', config=SEARCH_CONFIG)
+    + SearchVector('engine', weight='B', config=SEARCH_CONFIG)
+    + SearchVector('color', weight='B', config=SEARCH_CONFIG)
+    + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+)
+# bm25() weights, in FTS_TABLE column order: model, description, engine,
+# color, and the unindexed listing_id.
+FTS_WEIGHTS = '10.0, 1.0, 5.0, 5.0, 0.0'
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query)
+
+
+def search_listings(queryset, query):
+    """Restrict ``queryset`` to listings matching ``query``.
+
+    Matches are annotated with ``search_rank``; higher is more relevant
+    on every backend. SQLite uses the FTS5 table kept in sync by
+    ``main.signals``, PostgreSQL the GIN-indexed ``search_vector`` column.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset.annotate(
+            search_rank=Value(0.0, output_field=FloatField())).none()
+
+    if connection.vendor == 'sqlite':
+        return search_sqlite(queryset, terms)
+    if connection.vendor == 'postgresql':
+        search_query = SearchQuery(query, search_type='websearch',
+                                   config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query))
+
+    condition = Q()
+    for term in terms:
+        condition &= (Q(model__icontains=term)
+                      | Q(description__icontains=term)
+                      | Q(engine__icontains=term)
+                      | Q(color__icontains=term))
+    return queryset.filter(condition).annotate(
+        search_rank=Value(0.0, output_field=FloatField()))
+
+
+class FtsMatches:
+    """INNER JOIN of the FTS5 rows matching a query, ranked in one pass.
+
+    Joining the matches both restricts the listings to them and gives every
+    match its bm25() without looking it up again per listing. Provides what
+    Query.alias_map expects of its entries, see
+    django.db.models.sql.datastructures.Join.
+    """
+    table_name = 'fts_matches'
+    nullable = False
+    filtered_relation = None
+
+    def __init__(self, match, parent_alias, table_alias=None):
+        self.match = match
+        self.parent_alias = parent_alias
+        self.table_alias = table_alias
+        self.join_type = INNER
+
+    def as_sql(self, compiler, connection):
+        qn = compiler.quote_name_unless_alias
+        # bm25() is lower for better matches, so negate it for a common order.
+        return (
+            f'INNER JOIN (SELECT listing_id, '
+            f'-bm25({FTS_TABLE}, {FTS_WEIGHTS}) AS rank FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s) {qn(self.table_alias)} '
+            f'ON ({qn(self.table_alias)}.listing_id = '
+            f'{qn(self.parent_alias)}.id)',
+            [self.match],
+        )
+
+    def relabeled_clone(self, change_map):
+        return self.__class__(
+            self.match, change_map.get(self.parent_alias, self.parent_alias),
+            change_map.get(self.table_alias, self.table_alias))
+
+    @property
+    def identity(self):
+        return self.__class__, self.match, self.parent_alias
+
+    def __eq__(self, other):
+        if not isinstance(other, FtsMatches):
+            return NotImplemented
+        return self.identity == other.identity
+
+    def __hash__(self):
+        return hash(self.identity)
+
+    # Never outer-joined: a listing without a match is not a result.
+    def demote(self):
+        return self
+
+    def promote(self):
+        return self
+
+
+class FtsRank(Expression):
+    """The rank of a listing among the matches of an FTS5 query."""
+    output_field = FloatField()
+
+    def __init__(self, match, alias=None):
+        super().__init__()
+        self.match = match
+        self.alias = alias
+
+    def resolve_expression(self, query=None, allow_joins=True, reuse=None,
+                           summarize=False, for_save=False):
+        if self.alias is not None:
+            # Already joined, e.g. when the queryset is used as a subquery.
+            return self
+        clone = self.copy()
+        clone.alias = query.join(
+            FtsMatches(self.match, query.get_initial_alias()))
+        return clone
+
+    def relabeled_clone(self, change_map):
+        clone = self.copy()
+        clone.alias = change_map.get(self.alias, self.alias)
+        return clone
+
+    def as_sql(self, compiler, connection):
+        return f'{compiler.quote_name_unless_alias(self.alias)}.rank', []
+
+
+def search_sqlite(queryset, terms):
+    # Quote every term so user input can never be parsed as FTS5 syntax,
+    # and prefix-match it so "porsch" still finds "Porsche".
+    match = ' '.join('"{}"*'.format(term) for term in terms)
+    return queryset.annotate(search_rank=FtsRank(match))
+
+
+def update_search_index(listing):
+    if connection.vendor == 'sqlite':
+        remove_from_search_index(listing)
+        pk = Listing._meta.pk.get_db_prep_value(listing.pk, connection)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} '
+                f'(model, description, engine, color, listing_id) '
+                f'SELECT model, description, engine, color, id '
+                f'FROM {Listing._meta.db_table} WHERE id = %s', [pk])
+    elif connection.vendor == 'postgresql':
+        Listing.objects.filter(pk=listing.pk).update(
+            search_vector=SEARCH_VECTOR)
+
+
+def remove_from_search_index(listing):
+    if connection.vendor == 'sqlite':
+        pk = Listing._meta.pk.get_db_prep_value(listing.pk, connection)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE listing_id = %s', [pk])
+
+
+def rebuild_search_index():
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} '
+                f'(model, description, engine, color, listing_id) '
+                f'SELECT model, description, engine, color, id '
+                f'FROM {Listing._meta.db_table}')
+    elif connection.vendor == 'postgresql':
+        Listing.objects.update(search_vector=SEARCH_VECTOR)
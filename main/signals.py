@@ -0,0 +1,22 @@
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from .cache import bump_generation
+from .models import Listing
+from .search import update_search_index, remove_from_search_index
+
+
+@receiver(post_save, sender=Listing)
+@receiver(post_delete, sender=Listing)
+def invalidate_listing_cache(sender, instance, **kwargs):
+    bump_generation()
+
+
+@receiver(post_save, sender=Listing)
+def index_listing(sender, instance, **kwargs):
+    update_search_index(instance)
+
+
+@receiver(pre_delete, sender=Listing)
+def unindex_listing(sender, instance, **kwargs):
+    remove_from_search_index(instance)
@@ -0,0 +1,65 @@
+import hashlib
+import os
+import re
+import uuid
+from pathlib import PurePosixPath
+
+from django.core.files.storage import FileSystemStorage
+
+# <ab>/<cd>/<sha256><ext>: two levels of 256 shards keep directories small
+# even with millions of files.
+HASHED_NAME_RE = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(\.\w+)?$')
+
+
+def is_content_addressed(name):
+    return bool(HASHED_NAME_RE.match(name))
+
+
+def content_hash(content):
+    sha256 = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        sha256.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return sha256.hexdigest()
+
+
+def hashed_name(digest, name):
+    ext = PurePosixPath(name).suffix.lower()
+    return f'{digest[:2]}/{digest[2:4]}/{digest}{ext}'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Stores every file under the SHA-256 of its bytes.
+
+    The directory and base name chosen by ``upload_to`` are ignored; only
+    the extension is kept. Saving bytes that are already stored returns
+    the existing name without writing anything, so identical uploads share
+    one file and a name never changes content, which lets it be cached
+    forever.
+
+    Because files are shared, deleting a model instance must not delete its
+    file; unreferenced files are left for a garbage collector.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is only known once the content is hashed in
+        # _save(), and equal names mean equal bytes, so there is nothing to
+        # disambiguate here.
+        return name
+
+    def _save(self, name, content):
+        name = hashed_name(content_hash(content), name)
+        if self.exists(name):
+            # The blob is referenced again, so it must look new to gc_media
+            # however long it sat unreferenced.
+            os.utime(self.path(name))
+            return name
+        # Write under a unique temporary name and rename into place, so a
+        # concurrent reader never sees a partial file and two writers of
+        # the same bytes cannot collide.
+        temp_name = super()._save(f'{name}.{uuid.uuid4().hex}.tmp', content)
+        os.replace(self.path(temp_name), self.path(name))
+        return name
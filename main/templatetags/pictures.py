@@ -0,0 +1,78 @@
+from django import template
+from django.core.files.storage import default_storage
+
+from main.consts import LISTING_IMAGE_SIZES, PROFILE_PHOTO_SIZES
+from main.images import CONTENT_TYPES, MODERN_FORMATS
+
+register = template.Library()
+
+
+def srcset(entries):
+    return ', '.join(f'{url} {width}w' for url, width in entries)
+
+
+def modern_sources(variants, sizes):
+    sources = []
+    for fmt in MODERN_FORMATS:
+        entries = [(default_storage.url(variants[name][fmt]), sizes[name][0])
+                   for name in sizes if fmt in variants.get(name, {})]
+        if entries:
+            sources.append({'type': CONTENT_TYPES[fmt],
+                            'srcset': srcset(entries)})
+    return sources
+
+
+def with_metadata(attrs, width, height, color, placeholder=''):
+    """Give the <img> its intrinsic size, so the layout does not shift, and
+    paint the stored colour and placeholder behind it while it loads."""
+    attrs = dict(attrs)
+    if width and height:
+        attrs.setdefault('width', width)
+        attrs.setdefault('height', height)
+    background = color
+    if placeholder:
+        background = f'{color} url({placeholder}) center / cover no-repeat'
+    if background:
+        style = attrs.get('style', '')
+        attrs['style'] = f'{style} background: {background.strip()};'.strip()
+    return attrs
+
+
+@register.inclusion_tag('components/picture.html')
+def listing_picture(listing, size, sizes='', **attrs):
+    """<picture> for a listing image: modern formats first, then every
+    JPEG size in ``srcset`` so the browser picks the smallest that fits.
+    ``size`` is the JPEG used as ``src`` by browsers without srcset.
+    While the resized copies are still being made, renders a placeholder
+    rather than the full-size upload."""
+    if listing.images_pending:
+        return {'placeholder': True, 'attrs': attrs}
+    fallback = getattr(listing, f'image_{size}') or listing.image
+    jpegs = [(getattr(listing, f'image_{name}').url, box[0])
+             for name, box in LISTING_IMAGE_SIZES.items()
+             if getattr(listing, f'image_{name}')]
+    return {
+        'src': fallback.url,
+        'srcset': srcset(jpegs),
+        'sources': modern_sources(listing.image_variants,
+                                  LISTING_IMAGE_SIZES),
+        'sizes': sizes,
+        'attrs': with_metadata(attrs, listing.image_width, listing.image_height,
+                               listing.image_color, listing.image_placeholder),
+    }
+
+
+@register.inclusion_tag('components/picture.html')
+def profile_picture(profile, sizes='', **attrs):
+    """<picture> for a seller's avatar, falling back to the original photo
+    until the crops have been generated."""
+    avatar = profile.photo_avatar or profile.photo
+    return {
+        'src': avatar.url if avatar else '',
+        'srcset': '',
+        'sources': modern_sources(profile.photo_variants, PROFILE_PHOTO_SIZES),
+        'sizes': sizes,
+        # Avatars are always sized by the template, and too small for the
+        # placeholder image to be worth it.
+        'attrs': with_metadata(attrs, None, None, profile.photo_color),
+    }
@@ -0,0 +1,26 @@
+import json
+from functools import cache
+
+from django import template
+from django.contrib.staticfiles import finders
+
+register = template.Library()
+
+
+@cache
+def landing_manifest():
+    """Renditions written by ``manage.py encode_landing_video``, or None
+    before the video has been encoded."""
+    path = finders.find('videos/landing.json')
+    if path is None:
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+@register.inclusion_tag('components/landing_video.html')
+def landing_video():
+    manifest = landing_manifest()
+    if manifest is None:
+        return {'renditions': [{'src': 'videos/bg.mp4', 'media': ''}]}
+    return manifest
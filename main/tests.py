@@ -1,3 +1,1284 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
\ No newline at end of file
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files import locks
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.template.loader import render_to_string
+from django.http import QueryDict
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import ExifTags, Image
+
+from . import jobs, likebuffer, resize, trending
+from .cache import (GENERATION_KEY, bump_generation, get_generation,
+                    get_stats, normalize_query)
+from .consts import LISTING_IMAGE_SIZES, SEARCH_ORDERING
+from .management.commands.benchmark_listing_indexes import (
+    BENCHMARK_USERNAME, Command as BenchmarkListingIndexes)
+from .management.commands.encode_landing_video import (
+    Command as EncodeLandingVideo)
+from .images import generate_listing_derivatives, modern_formats
+from .models import ImageJob, LikedListing, Listing, ListingEvent, TrendingScore
+from .pagination import KeysetPaginator
+from .search import FTS_TABLE, search_listings
+from .templatetags import pictures, videos
+
+
+def create_listing(profile, **kwargs):
+    fields = {
+        'seller': profile,
+        'brand': 'bmw',
+        'model': 'M3',
+        'vin': '1HGCM82633A004352',
+        'mileage': 42000,
+        'color': 'Black',
+        'description': 'Clean title, one owner.',
+        'engine': 'I6',
+        'transmisson': 'manual',
+        'image': 'user_1/listings/m3.jpg',
+    }
+    fields.update(kwargs)
+    return Listing.objects.create(**fields)
+
+
+def encode_json(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+class TempMediaRootMixin:
+    """Point MEDIA_ROOT at a fresh temporary directory for every test."""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+
+class HomeFeedTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('seller', password='password')
+        self.user.profile.photo = 'user_1/avatar.jpg'
+        self.user.profile.save()
+        self.client.login(username='seller', password='password')
+
+    def create_sellers(self, count):
+        profiles = []
+        for index in range(count):
+            user = User.objects.create_user(f'seller_{index}')
+            user.profile.photo = f'user_{user.id}/avatar.jpg'
+            user.profile.save()
+            profiles.append(user.profile)
+        return profiles
+
+    @override_settings(LISTINGS_PAGE_SIZE=100)
+    def test_home_query_count_does_not_grow_with_cards(self):
+        profiles = self.create_sellers(10)
+        for index in range(100):
+            create_listing(profiles[index % 10], model=f'Model {index}')
+
+        # session, user, facets, listings page; likes are fetched by the page
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('home'))
+        self.assertEqual(len(response.context['page']), 100)
+
+    def test_feed_json_marks_liked_listings(self):
+        liked, other = (create_listing(self.user.profile, model=f'Cayman {i}')
+                        for i in range(2))
+        LikedListing.objects.create(profile=self.user.profile, listing=liked)
+
+        # session, user, listings page with the liked state
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('home_feed'), {'q': 'cayman'})
+        self.assertEqual(
+            {result['id']: result['is_liked']
+             for result in response.json()['results']},
+            {str(liked.id): True, str(other.id): False})
+
+    def test_stream_renders_the_same_cards(self):
+        profiles = self.create_sellers(3)
+        for index in range(12):
+            create_listing(profiles[index % 3], model=f'Model {index}')
+
+        with self.settings(LISTINGS_STREAM_CHUNK_SIZE=5):
+            streamed = self.client.get(reverse('home'), {'stream': '1'})
+            self.assertTrue(streamed.streaming)
+            streamed = b''.join(streamed.streaming_content).decode()
+        page = self.client.get(reverse('home')).content.decode()
+
+        def cards(html):
+            return re.findall(
+                r'<div class="col"><div class="card.*?</button></div></div></div></div>',
+                html, re.DOTALL)
+        self.assertEqual(len(cards(page)), 12)
+        self.assertEqual(cards(streamed), cards(page))
+        self.assertEqual(streamed.count('</html>'), 1)
+
+    def test_card_markup_stays_small(self):
+        for index in range(20):
+            create_listing(self.user.profile, model=f'Model {index}')
+        request = RequestFactory().get(reverse('home'))
+        request.user = self.user
+        listings = list(Listing.objects.feed())
+
+        html = render_to_string('components/listing_cards.html',
+                                {'listings': listings}, request)
+        bytes_per_card = len(html.encode()) / len(listings)
+
+        # Handlers and icon paths are shared by the page, not repeated per card.
+        self.assertNotIn('<script', html)
+        self.assertNotIn('<path', html)
+        self.assertLess(bytes_per_card, 1400,
+                        f'{bytes_per_card:.0f} bytes per card')
+
+
+class KeysetPaginatorTest(TestCase):
+
+    def setUp(self):
+        profile = User.objects.create_user('seller').profile
+        for index in range(7):
+            create_listing(profile, model=f'Model {index}')
+        # Every row shares the first sort key, so only the id breaks ties.
+        Listing.objects.update(created_at=timezone.now())
+        self.expected = list(Listing.objects.order_by('-created_at', '-id'))
+        self.paginator = KeysetPaginator(Listing.objects.all(), 3)
+
+    def test_walk_forwards_and_back_with_tied_keys(self):
+        pages = [self.paginator.get_page()]
+        while pages[-1].has_next:
+            pages.append(self.paginator.get_page(after=pages[-1].next_cursor))
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual([row for page in pages for row in page], self.expected)
+        self.assertFalse(pages[0].has_previous)
+
+        back = self.paginator.get_page(before=pages[-1].previous_cursor)
+        self.assertEqual(list(back), list(pages[1]))
+        back = self.paginator.get_page(before=back.previous_cursor)
+        self.assertEqual(list(back), list(pages[0]))
+        self.assertFalse(back.has_previous)
+
+    def test_bad_cursors_fall_back_to_the_first_page(self):
+        first = list(self.paginator.get_page())
+        encode = self.paginator.encode_cursor
+        valid = encode(self.expected[2])
+        for cursor in ('!!!', 'bm90IGpzb24', valid[:-4],
+                       encode_json(['2024-01-01T00:00:00+00:00']),
+                       encode_json({'id': 1}),
+                       encode_json(['not a date', str(uuid.uuid4())]),
+                       encode_json(['2024-01-01T00:00:00+00:00', 'not a uuid'])):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(list(self.paginator.get_page(after=cursor)),
+                                 first)
+                self.assertEqual(list(self.paginator.get_page(before=cursor)),
+                                 first)
+
+    def test_home_ignores_bad_cursors(self):
+        User.objects.create_user('buyer', password='password')
+        self.client.login(username='buyer', password='password')
+        response = self.client.get(reverse('home'), {'after': 'garbage'})
+        self.assertEqual(response.status_code, 200)
+
+
+class ListingCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('buyer', password='password')
+        self.client.login(username='buyer', password='password')
+        self.listing = create_listing(self.user.profile, brand='bmw')
+
+    def page(self, **params):
+        return list(self.client.get(reverse('home'), params).context['page'])
+
+    def test_hit_and_miss(self):
+        self.assertEqual(self.page(brand='bmw'), [self.listing])
+        self.assertEqual(self.page(brand='bmw'), [self.listing])
+        self.assertEqual(get_stats(), {'hits': 1, 'misses': 1})
+
+        # The ids are cached; the rows are not.
+        Listing.objects.filter(pk=self.listing.pk).update(model='Z4')
+        self.assertEqual(self.page(brand='bmw')[0].model, 'Z4')
+
+    def test_save_and_delete_invalidate(self):
+        self.assertEqual(self.page(), [self.listing])
+        newer = create_listing(self.user.profile)
+        self.assertEqual(self.page(), [newer, self.listing])
+        newer.delete()
+        self.assertEqual(self.page(), [self.listing])
+        self.assertEqual(get_stats(), {'hits': 0, 'misses': 3})
+
+    def test_equivalent_queries_share_an_entry(self):
+        self.page(brand='bmw', transmisson='manual')
+        self.page(transmisson='manual', brand='bmw', utm_source='mail', q='')
+        self.assertEqual(get_stats(), {'hits': 1, 'misses': 1})
+
+    def test_normalize_query(self):
+        params = QueryDict('b=2&a=1&empty=&b=1&unknown=x')
+        self.assertEqual(normalize_query(params, ['a', 'b', 'empty', 'b']),
+                         'a=1&b=1&b=2')
+
+    def test_generation_survives_eviction(self):
+        generation = get_generation()
+        cache.delete(GENERATION_KEY)
+        bump_generation()
+        self.assertNotEqual(get_generation(), generation)
+
+
+class SearchTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', password='password')
+        self.client.login(username='buyer', password='password')
+
+    def search(self, query):
+        return list(search_listings(Listing.objects.all(), query).order_by(
+            *SEARCH_ORDERING))
+
+    def test_model_hits_rank_first(self):
+        in_description = create_listing(
+            self.user.profile, model='M3', description='Faster than a Cayman.')
+        in_model = create_listing(self.user.profile, model='Cayman S')
+        create_listing(self.user.profile, model='Miata')
+
+        self.assertEqual(self.search('cayman'), [in_model, in_description])
+        self.assertEqual(self.search('cayma'), [in_model, in_description])
+        self.assertEqual(self.search('"* OR'), [])
+
+    def test_matches_are_ranked_in_one_pass(self):
+        for index in range(3):
+            create_listing(self.user.profile, model=f'Cayman {index}')
+        queryset = search_listings(Listing.objects.feed(), 'cayman').order_by(
+            *SEARCH_ORDERING)
+
+        self.assertEqual(str(queryset.query).count('MATCH'), 1)
+        plan = queryset.explain()
+        self.assertEqual(plan.count('SCAN main_listing_fts'), 1)
+        self.assertNotIn('CORRELATED', plan)
+        self.assertEqual(len(queryset), 3)
+
+    def test_index_follows_saves_and_deletes(self):
+        listing = create_listing(self.user.profile, model='Supra')
+        self.assertEqual(self.search('supra'), [listing])
+
+        listing.model = 'Celica'
+        listing.save()
+        self.assertEqual(self.search('supra'), [])
+        self.assertEqual(self.search('celica'), [listing])
+
+        listing.delete()
+        self.assertEqual(self.search('celica'), [])
+
+    def test_renumbered_rowids(self):
+        # What a VACUUM may do to a table without an integer primary key.
+        listing = create_listing(self.user.profile, model='Supra')
+        with connection.cursor() as cursor:
+            cursor.execute('UPDATE main_listing SET rowid = rowid + 1000')
+        self.assertEqual(self.search('supra'), [listing])
+
+    @override_settings(LISTINGS_PAGE_SIZE=2)
+    def test_pages_by_rank(self):
+        for index in range(5):
+            create_listing(self.user.profile, model=f'Cayman {index}',
+                           description='cayman ' * index)
+        expected = self.search('cayman')
+
+        seen, params = [], {'q': 'cayman'}
+        while True:
+            page = self.client.get(reverse('home'), params).context['page']
+            seen.extend(page)
+            if not page.next_cursor:
+                break
+            params['after'] = page.next_cursor
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(seen), 5)
+
+
+class FacetsTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('buyer', password='password')
+        self.client.login(username='buyer', password='password')
+        for brand, transmisson, mileage in (
+                ('bmw', 'manual', 5000), ('bmw', 'automatic', 20000),
+                ('audi', 'manual', 30000), ('audi', 'automatic', 8000),
+                ('audi', 'manual', 200000)):
+            create_listing(self.user.profile, brand=brand,
+                           transmisson=transmisson, mileage=mileage)
+
+    def counts(self, **params):
+        facets = self.client.get(reverse('home'), params).context['facets']
+        return {param: {option['value']: option['count'] for option in options
+                        if option['count']}
+                for param, options in facets.items()}
+
+    def test_each_facet_ignores_only_its_own_filter(self):
+        self.assertEqual(self.counts(brand='audi', transmisson='manual'), {
+            # manual
+            'brand': {'bmw': 1, 'audi': 2},
+            # audi
+            'transmisson': {'manual': 2, 'automatic': 1},
+            # audi, manual
+            'mileage__lt': {50000: 1, 100000: 1, 150000: 1},
+        })
+        self.assertEqual(self.counts(transmisson='manual', mileage__lt=50000), {
+            # manual, under 50,000
+            'brand': {'bmw': 1, 'audi': 1},
+            # under 50,000
+            'transmisson': {'manual': 2, 'automatic': 2},
+            # manual
+            'mileage__lt': {10000: 1, 25000: 1, 50000: 2, 100000: 2,
+                            150000: 2},
+        })
+
+    def test_links_toggle_their_option(self):
+        facets = self.client.get(reverse('home'), {
+            'brand': 'audi', 'after': 'cursor'}).context['facets']
+        brands = {option['value']: option for option in facets['brand']}
+        self.assertTrue(brands['audi']['active'])
+        self.assertEqual(brands['audi']['query'], '')
+        self.assertEqual(brands['bmw']['query'], 'brand=bmw')
+
+
+class BenchmarkListingIndexesTest(TestCase):
+
+    def test_cleanup_removes_dependent_rows(self):
+        command = BenchmarkListingIndexes(stdout=StringIO())
+        sellers = command.create_sellers()
+        listings = [create_listing(sellers[0], model='Benchmark')
+                    for _ in range(3)]
+        ListingEvent.objects.create(listing=listings[0], kind=ListingEvent.VIEW)
+        jobs.enqueue_listing_images(listings[1])
+        trending.ingest(now=timezone.now() + timedelta(minutes=1))
+        ListingEvent.objects.create(listing=listings[2], kind=ListingEvent.VIEW)
+        self.assertTrue(TrendingScore.objects.exists())
+
+        command.cleanup(sellers, batch_size=2)
+
+        self.assertFalse(Listing.objects.exists())
+        self.assertFalse(TrendingScore.objects.exists())
+        self.assertFalse(ListingEvent.objects.exists())
+        self.assertFalse(ImageJob.objects.exists())
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE}')
+            self.assertEqual(cursor.fetchone()[0], 0)
+        self.assertFalse(User.objects.filter(
+            username=BENCHMARK_USERNAME.format(0)).exists())
+
+
+class ImageJobTest(TempMediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('seller', password='password')
+        self.client.login(username='seller', password='password')
+
+    def upload(self):
+        buffer = BytesIO()
+        Image.new('RGB', (2400, 1800), 'navy').save(buffer, 'JPEG')
+        return SimpleUploadedFile('car.jpg', buffer.getvalue(), 'image/jpeg')
+
+    def test_list_view_queues_image_work(self):
+        response = self.client.post(reverse('list'), {
+            'brand': 'bmw', 'model': 'M3', 'vin': '1HGCM82633A004352',
+            'mileage': 42000, 'color': 'Black', 'description': 'Clean.',
+            'engine': 'I6', 'transmisson': 'manual', 'image': self.upload(),
+            'address_1': '1 Main St', 'city': 'Springfield', 'state': 'IL',
+            'zip_code': '62701',
+        })
+        self.assertRedirects(response, reverse('home'))
+        listing = Listing.objects.get()
+        job = ImageJob.objects.get()
+        self.assertEqual(job.status, ImageJob.PENDING)
+        self.assertTrue(listing.images_pending)
+        self.assertFalse(listing.image_card)
+        self.assertContains(self.client.get(reverse('home')),
+                            'Processing photo')
+
+        call_command('process_image_jobs', '--once', stdout=StringIO())
+
+        job.refresh_from_db()
+        listing.refresh_from_db()
+        self.assertEqual(job.status, ImageJob.DONE)
+        self.assertFalse(listing.images_pending)
+        self.assertEqual(listing.image_card.width, 640)
+        self.assertEqual((listing.image_width, listing.image_height),
+                         (2400, 1800))
+        # Navy, give or take JPEG rounding.
+        self.assertRegex(listing.image_color, r'^#0[0-2]0[0-2]8[0-2]$')
+        self.assertTrue(listing.image_placeholder.startswith('data:image/'))
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, listing.image_card.url)
+        self.assertContains(response, 'width="2400" height="1800"')
+
+    def test_profile_form_queues_avatar(self):
+        response = self.client.post(reverse('profile'), {
+            'first_name': '', 'last_name': '', 'email': '', 'bio': '',
+            'phone_number': '', 'photo': self.upload(),
+            'address_1': '1 Main St', 'city': 'Springfield', 'state': 'IL',
+            'zip_code': '62701',
+        })
+        self.assertRedirects(response, reverse('profile'))
+        self.assertEqual(ImageJob.objects.get().kind, ImageJob.PROFILE)
+
+        call_command('process_image_jobs', '--once', stdout=StringIO())
+
+        profile = self.user.profile
+        profile.refresh_from_db()
+        self.assertEqual((profile.photo_avatar.width,
+                          profile.photo_avatar.height), (60, 60))
+        self.assertIn('webp', profile.photo_variants['avatar'])
+        self.assertLess(profile.photo_avatar.size, profile.photo.size)
+
+    def test_new_photo_replaces_old_avatar_right_away(self):
+        profile = self.user.profile
+        profile.photo_avatar = 'old_avatar.jpg'
+        profile.photo_variants = {'avatar': {'webp': 'old_avatar.webp'}}
+        profile.photo_color = '#000000'
+        profile.save()
+
+        self.client.post(reverse('profile'), {
+            'first_name': '', 'last_name': '', 'email': '', 'bio': '',
+            'phone_number': '', 'photo': self.upload(),
+            'address_1': '1 Main St', 'city': 'Springfield', 'state': 'IL',
+            'zip_code': '62701',
+        })
+
+        profile.refresh_from_db()
+        self.assertFalse(profile.photo_avatar)
+        self.assertEqual(profile.photo_variants, {})
+        self.assertEqual(profile.photo_color, '')
+        html = render_to_string('components/picture.html',
+                                pictures.profile_picture(profile))
+        self.assertIn(profile.photo.url, html)
+        self.assertNotIn('old_avatar', html)
+
+    def test_failed_job_falls_back_to_original(self):
+        listing = create_listing(self.user.profile, images_pending=True,
+                                 image='user_1/listings/missing.jpg')
+        ImageJob.objects.create(kind=ImageJob.LISTING, object_id=listing.pk)
+
+        with self.settings(IMAGE_JOB_MAX_ATTEMPTS=2):
+            call_command('process_image_jobs', '--once',
+                         stdout=StringIO(), stderr=StringIO())
+
+        job = ImageJob.objects.get()
+        listing.refresh_from_db()
+        self.assertEqual(job.status, ImageJob.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertFalse(listing.images_pending)
+
+    def test_decoder_errors_fail_the_job(self):
+        listing = create_listing(self.user.profile, images_pending=True)
+        ImageJob.objects.create(kind=ImageJob.LISTING, object_id=listing.pk)
+
+        with self.settings(IMAGE_JOB_MAX_ATTEMPTS=1), mock.patch(
+                'main.jobs.generate_listing_derivatives',
+                side_effect=Image.DecompressionBombError('too big')):
+            call_command('process_image_jobs', '--once',
+                         stdout=StringIO(), stderr=StringIO())
+
+        job = ImageJob.objects.get()
+        self.assertEqual(job.status, ImageJob.FAILED)
+        self.assertEqual(job.error, 'DecompressionBombError: too big')
+
+    def test_jobs_that_kill_the_worker_are_not_retried_forever(self):
+        listing = create_listing(self.user.profile, images_pending=True)
+        stale = timezone.now() - timedelta(days=1)
+        crashed = ImageJob.objects.create(
+            kind=ImageJob.LISTING, object_id=listing.pk,
+            status=ImageJob.RUNNING, attempts=3)
+        retried = ImageJob.objects.create(
+            kind=ImageJob.PROFILE, object_id=self.user.profile.pk,
+            status=ImageJob.RUNNING, attempts=1)
+        ImageJob.objects.update(updated_at=stale)
+
+        with self.settings(IMAGE_JOB_MAX_ATTEMPTS=3):
+            self.assertEqual(jobs.requeue_stale_jobs(), 1)
+
+        crashed.refresh_from_db()
+        retried.refresh_from_db()
+        listing.refresh_from_db()
+        self.assertEqual(crashed.status, ImageJob.FAILED)
+        self.assertEqual(retried.status, ImageJob.PENDING)
+        self.assertFalse(listing.images_pending)
+
+
+class ImageDerivativesTest(TempMediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.profile = User.objects.create_user('seller').profile
+
+    def create_listing(self, size=(2400, 1800), exif=None):
+        buffer = BytesIO()
+        Image.linear_gradient('L').resize(size).convert('RGB').save(
+            buffer, 'JPEG', quality=95, exif=exif or Image.Exif())
+        return create_listing(self.profile, image=default_storage.save(
+            'car.jpg', ContentFile(buffer.getvalue())))
+
+    def test_every_size_is_generated(self):
+        listing = self.create_listing()
+        written = generate_listing_derivatives(listing)
+
+        listing.refresh_from_db()
+        for name, box in LISTING_IMAGE_SIZES.items():
+            field = getattr(listing, f'image_{name}')
+            self.assertEqual((field.width, field.height), box)
+            self.assertEqual(written[name]['jpeg'], field.size)
+            self.assertLess(field.size, listing.image.size)
+            for fmt in modern_formats():
+                self.assertTrue(default_storage.exists(
+                    listing.image_variants[name][fmt]))
+        self.assertEqual((listing.image_width, listing.image_height),
+                         (2400, 1800))
+        self.assertFalse(listing.images_pending)
+
+    def test_exif_orientation_is_applied(self):
+        exif = Image.Exif()
+        exif[ExifTags.Base.Orientation] = 6
+        listing = self.create_listing(size=(1600, 1200), exif=exif)
+        generate_listing_derivatives(listing)
+
+        listing.refresh_from_db()
+        self.assertEqual((listing.image_width, listing.image_height),
+                         (1200, 1600))
+        self.assertEqual((listing.image_card.width, listing.image_card.height),
+                         (360, 480))
+
+    def test_backfill_reports_bytes_saved(self):
+        listing = self.create_listing()
+        original_size = listing.image.size
+
+        out = StringIO()
+        call_command('generate_image_derivatives', stdout=out)
+        report = out.getvalue()
+        self.assertIn('Processed 1 listings and 0 profiles, 0 failed.', report)
+        original, smallest = re.search(
+            r'\(([\d,]+) -> ([\d,]+)\)', report).groups()
+        self.assertEqual(int(original.replace(',', '')),
+                         original_size * len(LISTING_IMAGE_SIZES))
+        self.assertLess(int(smallest.replace(',', '')), original_size)
+
+        out = StringIO()
+        call_command('generate_image_derivatives', stdout=out)
+        self.assertIn('Processed 0 listings', out.getvalue())
+
+
+class PictureTagTest(TestCase):
+
+    def setUp(self):
+        self.profile = User.objects.create_user('seller').profile
+
+    def render(self, listing):
+        return render_to_string('components/picture.html', pictures.listing_picture(
+            listing, 'card', sizes='33vw', alt='M3'))
+
+    def test_listing_picture(self):
+        listing = create_listing(
+            self.profile, image='car.jpg', image_card='car_card.jpg',
+            image_detail='car_detail.jpg', image_full='car_full.jpg',
+            image_width=2400, image_height=1800,
+            image_variants={
+                name: {'avif': f'car_{name}.avif', 'webp': f'car_{name}.webp'}
+                for name in LISTING_IMAGE_SIZES})
+        html = self.render(listing)
+
+        self.assertIn(
+            '<source type="image/webp" srcset="/media/car_card.webp 640w, '
+            '/media/car_detail.webp 1280w, /media/car_full.webp 1920w" '
+            'sizes="33vw">', html)
+        self.assertLess(html.index('image/avif'), html.index('image/webp'))
+        self.assertIn(
+            '<img src="/media/car_card.jpg" srcset="/media/car_card.jpg 640w, '
+            '/media/car_detail.jpg 1280w, /media/car_full.jpg 1920w" '
+            'sizes="33vw"', html)
+        self.assertIn('width="2400" height="1800"', html)
+        self.assertIn('alt="M3"', html)
+
+    def test_without_derivatives(self):
+        listing = create_listing(self.profile, image='car.jpg')
+        html = self.render(listing)
+        self.assertNotIn('<source', html)
+        self.assertNotIn('srcset', html)
+        self.assertIn('<img src="/media/car.jpg"', html)
+
+    def test_pending_images_render_a_placeholder(self):
+        listing = create_listing(self.profile, image='car.jpg',
+                                 images_pending=True)
+        html = self.render(listing)
+        self.assertNotIn('car.jpg', html)
+        self.assertIn('Processing photo', html)
+
+
+class ContentAddressedStorageTest(TempMediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('seller')
+
+    def test_identical_bytes_are_stored_once(self):
+        first = default_storage.save('user_1/car.JPG', ContentFile(b'car'))
+        second = default_storage.save('user_2/car_1.jpg', ContentFile(b'car'))
+        other = default_storage.save('user_1/car.jpg', ContentFile(b'van'))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertRegex(first, r'^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertEqual(len(default_storage.listdir(first.rsplit('/', 1)[0])[1]), 1)
+
+    def test_rehash_media_rewrites_old_paths(self):
+        old_name = FileSystemStorage().save(
+            'user_1/listings/m3.jpg', ContentFile(b'm3'))
+        listing = create_listing(self.user.profile, image=old_name,
+                                 image_variants={'card': {'webp': old_name}})
+
+        call_command('rehash_media', '--delete-old', stdout=StringIO())
+
+        listing.refresh_from_db()
+        self.assertNotEqual(listing.image.name, old_name)
+        self.assertEqual(listing.image.read(), b'm3')
+        self.assertEqual(listing.image_variants,
+                         {'card': {'webp': listing.image.name}})
+        self.assertFalse(default_storage.exists(old_name))
+
+
+@override_settings(MEDIA_ACCEL_REDIRECT='')
+class MediaServeTest(TempMediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.name = default_storage.save('car.jpg', ContentFile(b'0123456789'))
+        self.url = default_storage.url(self.name)
+
+    def test_hashed_name_is_immutable(self):
+        response = self.client.get(self.url)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertIn('immutable', response['Cache-Control'])
+
+        response = self.client.get(self.url,
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-4')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'234')
+        self.assertEqual(response['Content-Range'], 'bytes 2-4/10')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-4',
+                                   HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_accel_redirect_and_missing_files(self):
+        with self.settings(MEDIA_ACCEL_REDIRECT='/protected-media/'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'],
+                         f'/protected-media/{self.name}')
+        self.assertEqual(response.content, b'')
+
+        self.assertEqual(self.client.get('/media/missing.jpg').status_code, 404)
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+
+
+class GarbageCollectMediaTest(TempMediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('seller')
+
+    def test_only_unreferenced_files_are_removed(self):
+        image = default_storage.save('car.jpg', ContentFile(b'car'))
+        variant = default_storage.save('car.webp', ContentFile(b'webp'))
+        orphan = default_storage.save('old.jpg', ContentFile(b'old'))
+        create_listing(self.user.profile, image=image,
+                       image_variants={'card': {'webp': variant}})
+        quarantine = os.path.join(self.media_root, 'quarantine')
+
+        call_command('gc_media', '--dry-run', '--min-age=0', stdout=StringIO())
+        self.assertTrue(default_storage.exists(orphan))
+
+        call_command('gc_media', '--min-age=0', f'--quarantine={quarantine}',
+                     stdout=StringIO())
+        self.assertTrue(default_storage.exists(image))
+        self.assertTrue(default_storage.exists(variant))
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertTrue(os.path.exists(os.path.join(quarantine, orphan)))
+
+    def test_recent_files_are_kept(self):
+        orphan = default_storage.save('new.jpg', ContentFile(b'new'))
+        call_command('gc_media', stdout=StringIO())
+        self.assertTrue(default_storage.exists(orphan))
+
+    def test_reuploaded_orphan_is_kept(self):
+        name = default_storage.save('old.jpg', ContentFile(b'old'))
+        os.utime(default_storage.path(name), (1, 1))
+
+        self.assertEqual(
+            default_storage.save('again.jpg', ContentFile(b'old')), name)
+        call_command('gc_media', stdout=StringIO())
+        self.assertTrue(default_storage.exists(name))
+
+    def test_references_are_checked_again_before_removing(self):
+        name = default_storage.save('old.jpg', ContentFile(b'old'))
+        os.utime(default_storage.path(name), (1, 1))
+
+        # Referenced by a row saved while the media tree was being walked.
+        with mock.patch(
+                'main.management.commands.gc_media.referenced_names',
+                side_effect=[iter([]), iter([name])]):
+            call_command('gc_media', stdout=StringIO())
+        self.assertTrue(default_storage.exists(name))
+
+    def test_odd_names_survive_the_candidates_file(self):
+        path = os.path.join(self.media_root, 'line\nbreak "é".jpg')
+        with open(path, 'wb') as f:
+            f.write(b'old')
+
+        out = StringIO()
+        call_command('gc_media', '--min-age=0', stdout=out)
+        self.assertFalse(os.path.exists(path))
+        self.assertIn('Deleted 1 orphans', out.getvalue())
+
+
+class ResizeMediaTest(TempMediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        cache_dir = override_settings(RESIZE_CACHE_DIR=self.cache_dir)
+        cache_dir.enable()
+        self.addCleanup(cache_dir.disable)
+        buffer = BytesIO()
+        Image.new('RGB', (1600, 1200), 'navy').save(buffer, 'JPEG')
+        self.name = default_storage.save('car.jpg', ContentFile(buffer.getvalue()))
+
+    def get(self, width, **headers):
+        return self.client.get(
+            reverse('media_resize', args=[width, self.name]), **headers)
+
+    def test_resize_is_cached(self):
+        response = self.get(300, HTTP_ACCEPT='image/webp,*/*')
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('Accept', response['Vary'])
+        image = Image.open(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(image.size, (300, 225))
+
+        with mock.patch('main.resize.render') as render:
+            response = self.get(300, HTTP_ACCEPT='image/webp,*/*')
+        render.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get(300)['Content-Type'], 'image/jpeg')
+        self.assertEqual(self.get(5000).status_code, 404)
+
+    def test_concurrent_misses_render_once(self):
+        renders = []
+        original_render = resize.render
+
+        def slow_render(*args):
+            renders.append(args)
+            time.sleep(0.2)
+            original_render(*args)
+
+        source = default_storage.path(self.name)
+        stat = os.stat(source)
+        with mock.patch('main.resize.render', slow_render):
+            threads = [threading.Thread(
+                target=resize.get_resized, args=(source, stat, 200, 'jpeg'))
+                for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(renders), 1)
+
+    def test_least_recently_used_files_are_evicted(self):
+        source = default_storage.path(self.name)
+        stat = os.stat(source)
+        paths = [resize.get_resized(source, stat, width, 'jpeg')
+                 for width in (100, 200, 300)]
+        os.utime(paths[0], (1, 1))
+        os.utime(paths[1], (2, 2))
+        resize.touch(paths[0])
+
+        sizes = sum(os.path.getsize(path) for path in paths)
+        resize.sweep(self.cache_dir, sizes - 1)
+        self.assertEqual([os.path.exists(path) for path in paths],
+                         [True, False, True])
+
+    def test_only_idle_locks_are_removed(self):
+        shard = os.path.join(self.cache_dir, 'ab')
+        os.makedirs(shard)
+        held, idle = (os.path.join(shard, f'{name}.jpeg.lock')
+                      for name in ('held', 'idle'))
+        for path in (held, idle):
+            open(path, 'w').close()
+            os.utime(path, (1, 1))
+
+        with open(held, 'ab') as lock_file:
+            locks.lock(lock_file, locks.LOCK_EX)
+            resize.sweep(self.cache_dir, 1 << 30)
+            locks.unlock(lock_file)
+        self.assertTrue(os.path.exists(held))
+        self.assertFalse(os.path.exists(idle))
+
+    def test_decompression_bomb_is_a_client_error(self):
+        with mock.patch('main.resize.render',
+                        side_effect=Image.DecompressionBombError('too big')):
+            response = self.get(300)
+        self.assertEqual(response.status_code, 422)
+
+    def test_evicted_before_served_is_rendered_again(self):
+        calls = []
+
+        def get_resized_then_evict(*args):
+            path = resize.get_resized(*args)
+            if not calls:
+                # What a sweep in another worker may do right after.
+                os.remove(path)
+            calls.append(path)
+            return path
+
+        with mock.patch('main.media.get_resized', get_resized_then_evict):
+            response = self.get(300)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(calls), 2)
+        image = Image.open(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(image.size, (300, 225))
+
+
+class LandingVideoTest(TestCase):
+
+    def setUp(self):
+        self.static_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_dir)
+        os.mkdir(os.path.join(self.static_dir, 'videos'))
+        static = override_settings(STATICFILES_DIRS=[self.static_dir],
+                                   WHITENOISE_USE_FINDERS=True)
+        static.enable()
+        self.addCleanup(static.disable)
+        videos.landing_manifest.cache_clear()
+        self.addCleanup(videos.landing_manifest.cache_clear)
+
+    def write(self, name, content):
+        with open(os.path.join(self.static_dir, 'videos', name), 'w') as f:
+            f.write(content)
+
+    def test_original_video_until_encoded(self):
+        response = self.client.get(reverse('main'))
+        self.assertContains(response, 'src="/static/videos/bg.mp4"')
+        self.assertNotContains(response, 'poster=')
+
+    def test_renditions_are_picked_by_media_query(self):
+        self.write('landing.json', json.dumps({
+            'poster': 'videos/bg-poster.0123456789ab.jpg',
+            'renditions': [
+                {'src': 'videos/bg-480p.0123456789ab.mp4',
+                 'media': '(max-width: 640px)'},
+                {'src': 'videos/bg-1080p.0123456789ab.mp4', 'media': ''},
+            ],
+        }))
+        response = self.client.get(reverse('main'))
+        self.assertContains(response, 'poster="/static/videos/bg-poster.0123456789ab.jpg"')
+        self.assertContains(
+            response, '<source src="/static/videos/bg-480p.0123456789ab.mp4" '
+                      'type="video/mp4" media="(max-width: 640px)">')
+        self.assertNotContains(response, 'videos/bg.mp4')
+        # Playback is started by the script once Save-Data and reduced
+        # motion have been checked.
+        self.assertNotRegex(response.content.decode(), r'<video[^>]* autoplay')
+        self.assertContains(response, 'preload="none"')
+
+    def test_ffmpeg_failure_without_output(self):
+        failed = subprocess.CompletedProcess(['ffmpeg'], 1, '', '')
+        with mock.patch('subprocess.run', return_value=failed):
+            with self.assertRaisesMessage(CommandError,
+                                          'ffmpeg exited with status 1.'):
+                EncodeLandingVideo().run(['ffmpeg', '-i', 'bg.mp4'])
+
+    def test_encoded_video_supports_range_and_is_immutable(self):
+        self.write('bg-480p.0123456789ab.mp4', '0123456789')
+        response = self.client.get('/static/videos/bg-480p.0123456789ab.mp4',
+                                   HTTP_RANGE='bytes=0-3')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'0123')
+        self.assertIn('immutable', response['Cache-Control'])
+
+
+class LikeListingTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', password='password')
+        self.client.login(username='buyer', password='password')
+        self.listing = create_listing(self.user.profile)
+        self.url = reverse('like_listing', args=[self.listing.id])
+
+    def test_toggle(self):
+        response = self.client.post(self.url)
+        self.assertEqual(response.json(), {'is_liked_by_user': True})
+        self.assertEqual(self.listing.likedlisting_set.count(), 1)
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.like_count, 1)
+
+        response = self.client.post(self.url)
+        self.assertEqual(response.json(), {'is_liked_by_user': False})
+        self.assertFalse(self.listing.likedlisting_set.exists())
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.like_count, 0)
+
+    def test_toggle_statements(self):
+        # session, user, profile, then the toggle itself in a savepoint.
+        with self.assertNumQueries(8) as queries:
+            self.client.post(self.url)
+        statements = [query['sql'].split()[0] for query in queries][3:]
+        self.assertEqual(statements,
+                         ['SAVEPOINT', 'DELETE', 'INSERT', 'UPDATE', 'RELEASE'])
+
+    def test_duplicate_like_is_rejected(self):
+        self.client.post(self.url)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            LikedListing.objects.create(profile=self.user.profile,
+                                        listing=self.listing)
+
+    def test_get_is_not_allowed(self):
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+
+    def test_reconcile_like_counts(self):
+        other = create_listing(self.user.profile, like_count=5)
+        self.client.post(self.url)
+        Listing.objects.filter(pk=self.listing.pk).update(like_count=3)
+
+        call_command('reconcile_like_counts', stdout=StringIO())
+
+        self.assertEqual(
+            dict(Listing.objects.values_list('pk', 'like_count')),
+            {self.listing.pk: 1, other.pk: 0})
+
+    def test_popular_sort(self):
+        older = create_listing(self.user.profile, model='Older', like_count=2)
+        create_listing(self.user.profile, model='Newer')
+        response = self.client.get(reverse('home'), {'sort': 'popular'})
+        self.assertEqual(response.context['page'].object_list[0], older)
+
+    def test_popular_sort_follows_new_likes(self):
+        self.client.get(reverse('home'), {'sort': 'popular'})
+        newer = create_listing(self.user.profile, model='Newer')
+        self.client.get(reverse('home'), {'sort': 'popular'})
+
+        self.client.post(self.url)
+
+        response = self.client.get(reverse('home'), {'sort': 'popular'})
+        self.assertEqual(list(response.context['page']), [self.listing, newer])
+
+
+class LikeBufferTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.buffer_dir = tempfile.mkdtemp()
+        cls.settings = override_settings(
+            LIKE_BUFFER_PATH=os.path.join(cls.buffer_dir, 'likes.sqlite3'))
+        cls.settings.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings.disable()
+        shutil.rmtree(cls.buffer_dir)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', password='password')
+        self.client.login(username='buyer', password='password')
+        self.listing = create_listing(self.user.profile)
+        self.url = reverse('like_listing', args=[self.listing.id])
+
+    def tearDown(self):
+        likebuffer.connect().execute('DELETE FROM likes')
+
+    def test_clicks_are_buffered_until_flushed(self):
+        for liked in (True, False, True):
+            response = self.client.post(self.url)
+            self.assertEqual(response.json(), {'is_liked_by_user': liked})
+        self.assertFalse(LikedListing.objects.exists())
+        self.assertEqual(likebuffer.pending_count(), 3)
+
+        events, created, deleted, _ = likebuffer.flush()
+
+        self.assertEqual((events, created, deleted), (3, 1, 0))
+        self.assertEqual(likebuffer.pending_count(), 0)
+        self.assertEqual(self.listing.likedlisting_set.count(), 1)
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.like_count, 1)
+
+    def test_unlike_reads_database_state(self):
+        LikedListing.objects.create(profile=self.user.profile,
+                                    listing=self.listing)
+        Listing.objects.filter(pk=self.listing.pk).update(like_count=1)
+
+        response = self.client.post(self.url)
+
+        self.assertEqual(response.json(), {'is_liked_by_user': False})
+        likebuffer.flush()
+        self.assertFalse(LikedListing.objects.exists())
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.like_count, 0)
+
+    def test_replayed_batch_changes_nothing(self):
+        self.client.post(self.url)
+        likebuffer.record(self.user.profile.pk, self.listing.id, True)
+        likebuffer.flush()
+        likebuffer.record(self.user.profile.pk, self.listing.id, True)
+        likebuffer.flush()
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.like_count, 1)
+
+    def test_missing_listing(self):
+        url = reverse('like_listing', args=['00000000-0000-0000-0000-000000000000'])
+        self.assertEqual(self.client.post(url).status_code, 404)
+        self.assertEqual(likebuffer.pending_count(), 0)
+
+    def test_likes_by_deleted_users_are_dropped(self):
+        self.client.post(self.url)
+        self.user.delete()
+
+        self.assertEqual(likebuffer.flush()[:3], (1, 0, 0))
+        self.assertEqual(likebuffer.pending_count(), 0)
+
+    def test_flush_command_survives_errors(self):
+        self.client.post(self.url)
+        err = StringIO()
+        with mock.patch.object(likebuffer, 'flush',
+                               side_effect=IntegrityError('boom')):
+            call_command('flush_like_buffer', '--once', stderr=err)
+        self.assertIn('Flush failed: boom', err.getvalue())
+        self.assertEqual(likebuffer.pending_count(), 1)
+
+    def test_flush_command(self):
+        self.client.post(self.url)
+        out = StringIO()
+        call_command('flush_like_buffer', '--once', stdout=out)
+        self.assertIn('1 events: +1 -0', out.getvalue())
+        self.assertTrue(LikedListing.objects.exists())
+
+    def test_stats_report_lag(self):
+        self.client.post(self.url)
+        likebuffer.connect().execute('UPDATE likes SET created = created - 60')
+        out = StringIO()
+        call_command('flush_like_buffer', '--stats', stdout=out)
+        pending, lag = out.getvalue().split()
+        self.assertEqual(pending, 'pending=1')
+        self.assertGreaterEqual(float(lag[len('lag='):-1]), 60)
+
+
+class TrendingTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', password='password')
+        self.client.login(username='buyer', password='password')
+        self.seller = User.objects.create_user('seller').profile
+        self.later = timezone.now() + timedelta(minutes=1)
+
+    def test_scores_decay(self):
+        old, new = (create_listing(self.seller) for _ in range(2))
+        ListingEvent.objects.create(listing=old, kind=ListingEvent.INQUIRY)
+        ListingEvent.objects.create(listing=new, kind=ListingEvent.VIEW)
+        ListingEvent.objects.filter(listing=old).update(
+            created_at=timezone.now() - timedelta(days=3))
+
+        self.assertEqual(trending.ingest(now=self.later), (0, 2))
+
+        self.assertFalse(ListingEvent.objects.exists())
+        # Worth 5 three half-lives ago, i.e. 5/8 now, less than one view.
+        self.assertEqual(list(Listing.objects.trending().order_by(
+            '-trending_score')), [new, old])
+        self.assertAlmostEqual(
+            trending.current_value(old.trending.score, self.later), 5 / 8,
+            places=2)
+
+    def test_likes_are_ingested_once(self):
+        listing = create_listing(self.seller)
+        self.client.post(reverse('like_listing', args=[listing.id]))
+        self.assertEqual(trending.ingest(now=self.later), (1, 0))
+        self.assertEqual(trending.ingest(now=self.later), (0, 0))
+
+        self.client.get(reverse('listing', args=[listing.id]))
+        self.assertEqual(trending.ingest(now=self.later), (0, 1))
+        listing.trending.refresh_from_db()
+        self.assertAlmostEqual(
+            trending.current_value(listing.trending.score, self.later), 4,
+            places=2)
+
+    def test_toggling_counts_one_like(self):
+        listing = create_listing(self.seller)
+        url = reverse('like_listing', args=[listing.id])
+        for _ in range(5):
+            self.client.post(url)
+            self.client.post(url)
+            self.client.post(url)
+            trending.ingest(now=self.later)
+        self.assertEqual(listing.likedlisting_set.count(), 1)
+        listing.trending.refresh_from_db()
+        self.assertAlmostEqual(
+            trending.current_value(listing.trending.score, self.later), 3,
+            places=2)
+
+    def test_own_listing_is_not_counted(self):
+        listing = create_listing(self.user.profile)
+        self.client.get(reverse('listing', args=[listing.id]))
+        self.client.get(reverse('inquire_listing', args=[listing.id]))
+        self.assertFalse(ListingEvent.objects.exists())
+
+    def test_trending_sort_is_not_cached(self):
+        listing = create_listing(self.seller)
+        self.client.get(reverse('home'), {'sort': 'trending'})
+        TrendingScore.objects.create(listing=listing, score=1e6)
+        response = self.client.get(reverse('home'), {'sort': 'trending'})
+        self.assertEqual(list(response.context['page']), [listing])
+
+    def test_prune(self):
+        listing = create_listing(self.seller)
+        TrendingScore.objects.create(listing=listing, score=0)
+        self.assertEqual(trending.prune(), 1)
+
+    def test_top_is_one_query(self):
+        for _ in range(3):
+            ListingEvent.objects.create(
+                listing=create_listing(self.seller), kind=ListingEvent.VIEW)
+        trending.ingest(now=self.later)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(Listing.objects.feed().trending().order_by(
+                '-trending_score', '-id')[:50]), 3)
+
+    def test_trending_sort(self):
+        quiet, busy = (create_listing(self.seller) for _ in range(2))
+        create_listing(self.seller)
+        for kind in (ListingEvent.VIEW, ListingEvent.INQUIRY):
+            ListingEvent.objects.create(listing=busy, kind=kind)
+        ListingEvent.objects.create(listing=quiet, kind=ListingEvent.VIEW)
+        call_command('update_trending', '--once', stdout=StringIO())
+        self.assertEqual(TrendingScore.objects.count(), 0)
+
+        with mock.patch.object(trending, 'SETTLE', timedelta(0)):
+            call_command('update_trending', '--once', stdout=StringIO())
+        response = self.client.get(reverse('home'), {'sort': 'trending'})
+        self.assertEqual(list(response.context['page']), [busy, quiet])
+
+
+class LikedListingsTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', password='password')
+        self.client.login(username='buyer', password='password')
+        self.listings = [create_listing(self.user.profile) for _ in range(3)]
+        self.url = reverse('liked_listings')
+
+    def ids(self, listings):
+        return ','.join(str(listing.id) for listing in listings)
+
+    def test_liked_set_in_one_query(self):
+        for listing in self.listings[:2]:
+            LikedListing.objects.create(profile=self.user.profile,
+                                        listing=listing)
+        other = User.objects.create_user('other').profile
+        LikedListing.objects.create(profile=other, listing=self.listings[2])
+
+        theirs = create_listing(other)
+        LikedListing.objects.create(profile=self.user.profile, listing=theirs)
+
+        # session, user, likes and sellers
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, {
+                'ids': self.ids([*self.listings[1:], theirs])})
+        self.assertEqual(response.json(), {
+            'liked': sorted([str(self.listings[1].id), str(theirs.id)]),
+            'own': sorted(str(listing.id) for listing in self.listings[1:]),
+        })
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('csrftoken', response.cookies)
+
+    def test_invalid_ids(self):
+        self.assertEqual(
+            self.client.get(self.url, {'ids': 'nope'}).status_code, 400)
+        response = self.client.get(self.url, {
+            'ids': ','.join(str(uuid.uuid4()) for _ in range(101))})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(self.url).json(),
+                         {'liked': [], 'own': []})
+
+    def test_home_is_the_same_for_every_user(self):
+        LikedListing.objects.create(profile=self.user.profile,
+                                    listing=self.listings[0])
+        mine = self.client.get(reverse('home'))
+        User.objects.create_user('other', password='password')
+        self.client.login(username='other', password='password')
+        theirs = self.client.get(reverse('home'))
+
+        self.assertEqual(mine.content, theirs.content)
+        self.assertNotContains(mine, 'fill="red"')
+        self.assertNotContains(mine, 'csrfmiddlewaretoken')
+        self.assertNotContains(mine, 'data-seller')
+
+
+class ListingsApiTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', password='password')
+        self.client.login(username='buyer', password='password')
+        self.listing = create_listing(self.user.profile)
+        self.url = reverse('api_listings')
+
+    def test_conditional_get(self):
+        response = self.client.get(self.url, {'fields': 'id,model'})
+        self.assertEqual(response.json()['results'],
+                         [{'id': str(self.listing.id), 'model': 'M3'}])
+        response = self.client.get(self.url, {'fields': 'id,model'},
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        self.listing.save()
+        response = self.client.get(self.url, {'fields': 'id,model'},
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_no_etag_for_invalid_fields(self):
+        response = self.client.get(self.url, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('ETag', response)
+
+    def test_no_etag_for_like_ordered_sort(self):
+        response = self.client.get(self.url, {'sort': 'popular'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
@@ -0,0 +1,136 @@
+"""Time-decayed trending scores.
+
+An event of weight ``w`` at time ``t`` is worth ``w * exp(-λ(now - t))``
+now. Dividing every term by the same ``exp(-λ(now - EPOCH))`` leaves the
+order unchanged, so a listing's score is kept as
+
+    log(Σ w * exp(λ(t - EPOCH)))
+
+which never changes as time passes: new events are added to it with
+logaddexp, and the table's order is the trending order at any moment.
+"""
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .consts import TRENDING_WEIGHTS
+from .models import (LikedListing, Listing, ListingEvent, TrendingCheckpoint,
+                     TrendingLike, TrendingScore)
+
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+# Rows younger than this are left for the next run, so a transaction that
+# commits a lower id late is not skipped by the likes checkpoint.
+SETTLE = timedelta(seconds=5)
+
+
+def decay_rate():
+    return math.log(2) / (settings.TRENDING_HALF_LIFE * 3600)
+
+
+def log_score(weight, when):
+    return math.log(weight) + (when - EPOCH).total_seconds() * decay_rate()
+
+
+def logaddexp(a, b):
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def current_value(score, now=None):
+    """The decayed weight a stored score stands for at ``now``."""
+    now = now or timezone.now()
+    return math.exp(score - (now - EPOCH).total_seconds() * decay_rate())
+
+
+def half_life():
+    return timedelta(hours=settings.TRENDING_HALF_LIFE)
+
+
+def record_event(listing, kind):
+    ListingEvent.objects.create(listing=listing, kind=kind)
+
+
+def ingest(batch_size=1000, now=None):
+    """Fold up to ``batch_size`` new likes and events into the scores.
+
+    Likes are read past a checkpoint on LikedListing's id, views and
+    inquiries are deleted from ListingEvent as they are read, so no run
+    looks at an event twice. A profile liking the same listing again
+    within a half-life, e.g. by toggling the heart, is not counted again.
+    Returns ``(likes, events)`` read.
+    """
+    settled = (now or timezone.now()) - SETTLE
+    contributions = {}
+
+    def add(listing_id, kind, when):
+        value = log_score(TRENDING_WEIGHTS[kind], when)
+        if listing_id in contributions:
+            value = logaddexp(contributions[listing_id], value)
+        contributions[listing_id] = value
+
+    with transaction.atomic():
+        checkpoint, _ = TrendingCheckpoint.objects.select_for_update(
+        ).get_or_create(source='likes')
+        likes = list(LikedListing.objects.filter(
+            id__gt=checkpoint.position, like_date__lt=settled,
+        ).order_by('id').values_list(
+            'id', 'profile_id', 'listing_id', 'like_date')[:batch_size])
+        last_counted = {
+            (profile_id, listing_id): counted_at
+            for profile_id, listing_id, counted_at
+            in TrendingLike.objects.filter(
+                profile_id__in={row[1] for row in likes},
+                listing_id__in={row[2] for row in likes},
+            ).values_list('profile_id', 'listing_id', 'counted_at')
+        }
+        counted = {}
+        for _, profile_id, listing_id, when in likes:
+            pair = profile_id, listing_id
+            if pair in last_counted and when - last_counted[pair] < half_life():
+                continue
+            add(listing_id, 'like', when)
+            last_counted[pair] = counted[pair] = when
+        TrendingLike.objects.bulk_create([
+            TrendingLike(profile_id=profile_id, listing_id=listing_id,
+                         counted_at=when)
+            for (profile_id, listing_id), when in counted.items()
+        ], update_conflicts=True, unique_fields=['profile', 'listing'],
+            update_fields=['counted_at'])
+        events = list(ListingEvent.objects.filter(
+            created_at__lt=settled,
+        ).order_by('id').values_list(
+            'id', 'listing_id', 'kind', 'created_at')[:batch_size])
+        for _, listing_id, kind, when in events:
+            add(listing_id, kind, when)
+
+        scores = TrendingScore.objects.select_for_update().in_bulk(contributions)
+        for listing_id, score in scores.items():
+            score.score = logaddexp(score.score, contributions.pop(listing_id))
+        TrendingScore.objects.bulk_update(scores.values(), ['score'])
+        # Listings deleted since are skipped.
+        live = Listing.objects.filter(
+            id__in=contributions).values_list('id', flat=True)
+        TrendingScore.objects.bulk_create([
+            TrendingScore(listing_id=listing_id, score=contributions[listing_id])
+            for listing_id in live
+        ])
+
+        if likes:
+            checkpoint.position = likes[-1][0]
+            checkpoint.save(update_fields=['position'])
+        ListingEvent.objects.filter(id__in=[row[0] for row in events]).delete()
+    return len(likes), len(events)
+
+
+def prune(now=None):
+    """Drop scores that have decayed below TRENDING_MIN_SCORE, a range
+    delete on the score index, and likes that would count again."""
+    now = now or timezone.now()
+    TrendingLike.objects.filter(counted_at__lt=now - half_life()).delete()
+    floor = (math.log(settings.TRENDING_MIN_SCORE)
+             + (now - EPOCH).total_seconds() * decay_rate())
+    deleted, _ = TrendingScore.objects.filter(score__lt=floor).delete()
+    return deleted
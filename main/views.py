@@ -1,34 +1,260 @@
+import hashlib
+import uuid
 from importlib import reload
-from django.http import JsonResponse
+from itertools import islice
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import redirect, render, get_object_or_404
+from django.urls import reverse
+from django.template import loader
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
 from django.contrib.auth.decorators import login_required
+from django.db.models import Count, Exists, F, Max, OuterRef, Q, Value
+from django.db.models.functions import Greatest
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import condition, require_POST
 from django.contrib import messages
 from django.core.mail import send_mail
 
-from .models import LikedListing, Listing
+from .models import LikedListing, Listing, ListingEvent
 from .forms import ListingForm
 from users.forms import LocationForm
 from .filters import ListingFilter
+from .pagination import KeysetPaginator
+from .cache import CURSOR_PARAMS, get_cached_page, normalize_query
+from .facets import get_facets
+from .jobs import enqueue_listing_images
+from . import likebuffer
+from .trending import record_event
 
 
 def main_view(request):
     return render(request, "views/main.html", {"name": "AutoMax"})
 
 
+STREAM_MARKER = mark_safe('<!-- listing-stream -->')
+
+
+def get_listing_filter(request, listings=None):
+    # Cards are the same for every user; hearts are filled in by the page
+    # from liked_listings_view.
+    if listings is None:
+        listings = Listing.objects.feed()
+    return ListingFilter(request.GET, queryset=listings)
+
+
+def get_listings_page(request, listing_filter):
+    paginator = KeysetPaginator(listing_filter.qs, settings.LISTINGS_PAGE_SIZE,
+                                ordering=listing_filter.ordering)
+    if not listing_filter.cacheable:
+        return paginator.get_page(after=request.GET.get('after'),
+                                  before=request.GET.get('before'))
+    return get_cached_page(paginator, request.GET, listing_filter.filters)
+
+
+def stream_listing_cards(request, listing_filter, head, tail):
+    yield head
+    template = loader.get_template('components/listing_cards.html')
+    chunk_size = settings.LISTINGS_STREAM_CHUNK_SIZE
+    # iterator() keeps one chunk of rows in memory at a time.
+    listings = listing_filter.qs.order_by(
+        *listing_filter.ordering).iterator(chunk_size=chunk_size)
+    while chunk := list(islice(listings, chunk_size)):
+        yield template.render({'listings': chunk}, request)
+    yield tail
+
+
 @login_required
 def home_view(request):
-    listings = Listing.objects.all()
-    listing_filter = ListingFilter(request.GET, queryset=listings)
-    user_liked_listings = LikedListing.objects.filter(
-        profile=request.user.profile).values_list('listing')
-    liked_listings_ids = [l[0] for l in user_liked_listings]
+    listing_filter = get_listing_filter(request)
     context = {
         'listing_filter': listing_filter,
-        'liked_listings_ids': liked_listings_ids,
+        'facets': get_facets(listing_filter),
+        'liked_ids_limit': LIKED_IDS_LIMIT,
     }
+    if request.GET.get('stream'):
+        # Send the header and filter form right away and the cards as the
+        # rows come in, instead of rendering every card before the first byte.
+        context['stream_marker'] = STREAM_MARKER
+        head, tail = render_to_string(
+            "views/home.html", context, request).split(STREAM_MARKER)
+        return StreamingHttpResponse(
+            stream_listing_cards(request, listing_filter, head, tail))
+    context['page'] = get_listings_page(request, listing_filter)
     return render(request, "views/home.html", context)
 
 
+@login_required
+def home_feed_view(request):
+    page = get_listings_page(request, get_listing_filter(
+        request, Listing.objects.feed().with_liked_by(request.user)))
+    return JsonResponse({
+        'results': [{
+            'id': listing.id,
+            'model': listing.model,
+            'brand': listing.brand,
+            'mileage': listing.mileage,
+            'transmisson': listing.transmisson,
+            'description': listing.description,
+            'image': listing.image.url,
+            'seller': listing.seller.user.username,
+            'created_at': listing.created_at,
+            'updated_at': listing.updated_at,
+            'url': reverse('listing', kwargs={'id': listing.id}),
+            'is_liked': listing.is_liked,
+            'like_count': listing.like_count,
+        } for listing in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+# Most listing ids liked_listings_view answers for at once.
+LIKED_IDS_LIMIT = 100
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@ensure_csrf_cookie
+def liked_listings_view(request):
+    """Which of ``?ids=<id>,<id>,...`` the user has liked and which are
+    their own, in one query.
+
+    Everything personal on the feed comes from here, so the page itself is
+    the same for every user. Also sets the CSRF cookie the like button
+    posts with.
+    """
+    try:
+        ids = {uuid.UUID(value.strip()) for value in
+               request.GET.get('ids', '').split(',') if value.strip()}
+    except ValueError:
+        return JsonResponse({'error': 'ids must be listing ids.'}, status=400)
+    if len(ids) > LIKED_IDS_LIMIT:
+        return JsonResponse(
+            {'error': f'At most {LIKED_IDS_LIMIT} ids at a time.'}, status=400)
+
+    liked, own = set(), []
+    rows = Listing.objects.filter(id__in=ids).annotate(
+        liked=Exists(LikedListing.objects.filter(
+            profile__user=request.user, listing=OuterRef('pk'))),
+        own=Q(seller__user=request.user),
+    ).filter(Q(liked=True) | Q(own=True)).values_list('id', 'liked', 'own')
+    for listing_id, is_liked, is_own in rows:
+        if is_liked:
+            liked.add(listing_id)
+        if is_own:
+            own.append(listing_id)
+    if ids and likebuffer.enabled():
+        # Clicks not flushed yet win over the database.
+        for listing_id, state in likebuffer.pending_states(
+                request.user.profile.pk, ids).items():
+            if state:
+                liked.add(listing_id)
+            else:
+                liked.discard(listing_id)
+    return JsonResponse({
+        'liked': sorted(map(str, liked)),
+        'own': sorted(map(str, own)),
+    })
+
+
+# Public field name -> columns to load for it.
+API_FIELDS = {
+    'id': ['id'],
+    'created_at': ['created_at'],
+    'updated_at': ['updated_at'],
+    'brand': ['brand'],
+    'model': ['model'],
+    'vin': ['vin'],
+    'mileage': ['mileage'],
+    'color': ['color'],
+    'description': ['description'],
+    'engine': ['engine'],
+    'transmisson': ['transmisson'],
+    'image': ['image'],
+    'seller': ['seller', 'seller__user', 'seller__user__username'],
+    'location': ['location', 'location__city', 'location__state',
+                 'location__zip_code'],
+}
+
+
+def get_api_fields(request):
+    requested = request.GET.get('fields')
+    if not requested:
+        return list(API_FIELDS)
+    fields = [field.strip() for field in requested.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in API_FIELDS]
+    if unknown:
+        raise ValueError(f'Unknown fields: {", ".join(unknown)}')
+    return fields
+
+
+def serialize_api_field(listing, field):
+    if field == 'image':
+        return listing.image.url if listing.image else None
+    if field == 'seller':
+        return listing.seller.user.username
+    if field == 'location':
+        location = listing.location
+        if location is None:
+            return None
+        return {'city': location.city, 'state': location.state,
+                'zip_code': location.zip_code}
+    return getattr(listing, field)
+
+
+def listings_etag(request):
+    # The result changes whenever a matching listing is added, edited or
+    # removed, which moves either the newest updated_at or the row count.
+    try:
+        get_api_fields(request)
+    except ValueError:
+        # The view answers 400; an ETag would let that revalidate into a 304.
+        return None
+    listing_filter = ListingFilter(request.GET, queryset=Listing.objects.all())
+    if not listing_filter.cacheable:
+        # Likes and trending scores reorder these sorts without touching
+        # updated_at or the row count; no ETag, so no stale 304s.
+        return None
+    stats = listing_filter.qs.aggregate(
+        last_updated=Max('updated_at'), count=Count('pk'))
+    query = normalize_query(
+        request.GET, [*listing_filter.filters, *CURSOR_PARAMS, 'fields'])
+    key = f"{query}|{settings.LISTINGS_PAGE_SIZE}|{stats['last_updated']}|{stats['count']}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=listings_etag)
+def api_listings_view(request):
+    try:
+        fields = get_api_fields(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    columns = {'id', 'created_at'}
+    for field in fields:
+        columns.update(API_FIELDS[field])
+    listings = Listing.objects.only(*columns)
+    if 'seller' in fields:
+        listings = listings.select_related('seller__user')
+    if 'location' in fields:
+        listings = listings.select_related('location')
+
+    listing_filter = ListingFilter(request.GET, queryset=listings)
+    page = get_listings_page(request, listing_filter)
+    return JsonResponse({
+        'results': [{field: serialize_api_field(listing, field)
+                     for field in fields} for listing in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
 @login_required
 def list_view(request):
     if request.method == 'POST':
@@ -40,7 +266,9 @@ def list_view(request):
                 listing_location = location_form.save()
                 listing.seller = request.user.profile
                 listing.location = listing_location
+                listing.images_pending = True
                 listing.save()
+                enqueue_listing_images(listing)
                 messages.info(
                     request, f'{listing.model} Listing Posted Successfully!')
                 return redirect('home')
@@ -62,6 +290,8 @@ def listing_view(request, id):
         listing = Listing.objects.get(id=id)
         if listing is None:
             raise Exception
+        if listing.seller.user_id != request.user.id:
+            record_event(listing, ListingEvent.VIEW)
         return render(request, 'views/listing.html', {'listing': listing, })
     except Exception as e:
         messages.error(request, f'Invalid UID {id} was provided for listing.')
@@ -82,6 +312,8 @@ def edit_view(request, id):
             if listing_form.is_valid and location_form.is_valid:
                 listing_form.save()
                 location_form.save()
+                if 'image' in listing_form.changed_data:
+                    enqueue_listing_images(listing)
                 messages.info(request, f'Listing {id} updated successfully!')
                 return redirect('home')
             else:
@@ -103,25 +335,61 @@ def edit_view(request, id):
 
 
 @login_required
+@require_POST
 def like_listing_view(request, id):
-    listing = get_object_or_404(Listing, id=id)
+    if likebuffer.enabled():
+        return buffered_like_listing(request, id)
+    # One DELETE to unlike; a DELETE that matches nothing plus an INSERT to
+    # like. The unique (profile, listing) constraint settles double clicks.
+    # Either way like_count moves with a single UPDATE in the same
+    # transaction.
+    profile = request.user.profile
+    listing = Listing.objects.filter(id=id)
+    try:
+        with transaction.atomic():
+            deleted, _ = LikedListing.objects.filter(
+                profile=profile, listing_id=id).delete()
+            if deleted:
+                listing.update(
+                    like_count=Greatest(F('like_count') - 1, Value(0)))
+            else:
+                LikedListing.objects.create(profile=profile, listing_id=id)
+                listing.update(like_count=F('like_count') + 1)
+    except IntegrityError:
+        # Either a concurrent request liked it first, or there is no such
+        # listing and the foreign key failed.
+        if not listing.exists():
+            raise Http404('No such listing.')
+        deleted = 0
 
-    liked_listing, created = LikedListing.objects.get_or_create(
-        profile=request.user.profile, listing=listing)
+    return JsonResponse({
+        'is_liked_by_user': not deleted,
+    })
 
-    if not created:
-        liked_listing.delete()
-    else:
-        liked_listing.save()
 
+def buffered_like_listing(request, id):
+    # Write-behind: the new state goes to the local buffer and
+    # flush_like_buffer applies it to the database later.
+    profile_id = request.user.profile.pk
+    liked = likebuffer.pending_state(profile_id, id)
+    if liked is None:
+        liked = Listing.objects.filter(id=id).annotate(
+            liked=Exists(LikedListing.objects.filter(
+                profile_id=profile_id, listing=OuterRef('pk'))),
+        ).values_list('liked', flat=True).first()
+        if liked is None:
+            raise Http404('No such listing.')
+    likebuffer.record(profile_id, id, not liked)
     return JsonResponse({
-        'is_liked_by_user': created,
+        'is_liked_by_user': not liked,
     })
 
 
 @login_required
 def inquire_listing_using_email(request, id):
     listing = get_object_or_404(Listing, id=id)
+    if listing.seller.user_id != request.user.id:
+        record_event(listing, ListingEvent.INQUIRY)
     try:
         emailSubject = f'{request.user.username} is interested in {listing.model}'
         emailMessage = f'Hi {listing.seller.user.username}, {request.user.username} is interested in your {listing.model} listing on AutoMax'
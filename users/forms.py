@@ -3,6 +3,7 @@ from django import forms
 from django.contrib.auth.models import User
 from localflavor.us.forms import USZipCodeField
 
+from main.jobs import enqueue_profile_photo
 from .models import Location, Profile
 from .widgets import CustomPictureImageFieldWidget
 
@@ -23,6 +24,20 @@ class ProfileForm(forms.ModelForm):
         model = Profile
         fields = ('photo', 'bio', 'phone_number')
 
+    def save(self, commit=True):
+        if 'photo' in self.changed_data:
+            # Until the new crops are rendered, show the new photo rather
+            # than the old one's avatar; and keep showing it if that fails.
+            self.instance.photo_avatar = ''
+            self.instance.photo_variants = {}
+            self.instance.photo_width = self.instance.photo_height = None
+            self.instance.photo_color = self.instance.photo_placeholder = ''
+        profile = super().save(commit)
+        if commit and 'photo' in self.changed_data:
+            # The avatar crops are rendered in the background.
+            enqueue_profile_photo(profile)
+        return profile
+
 
 class LocationForm(forms.ModelForm):
 
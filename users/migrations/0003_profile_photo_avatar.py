@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-18 04:55
+
+import users.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='photo_avatar',
+            field=models.ImageField(blank=True, editable=False, upload_to=users.utils.user_directory_path),
+        ),
+    ]
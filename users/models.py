@@ -21,6 +21,18 @@ class Location(models.Model):
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     photo = models.ImageField(upload_to=user_directory_path, null=True)
+    # Cropped copy shown on feed cards, see main.images.
+    photo_avatar = models.ImageField(
+        upload_to=user_directory_path, blank=True, editable=False)
+    # Upright size, most common colour and an inline blurred copy of photo.
+    photo_width = models.PositiveIntegerField(
+        null=True, blank=True, editable=False)
+    photo_height = models.PositiveIntegerField(
+        null=True, blank=True, editable=False)
+    photo_color = models.CharField(max_length=7, blank=True, editable=False)
+    photo_placeholder = models.TextField(blank=True, editable=False)
+    # WebP/AVIF copies of each crop: {size: {format: name}}.
+    photo_variants = models.JSONField(default=dict, blank=True, editable=False)
     bio = models.CharField(max_length=140, blank=True)
     phone_number = models.CharField(max_length=12, blank=True)
     location = models.OneToOneField(
@@ -62,7 +62,8 @@ class RegisterView(View):
 class ProfileView(View):
 
     def get(self, request):
-        user_listings = Listing.objects.filter(seller=request.user.profile)
+        user_listings = Listing.objects.filter(
+            seller=request.user.profile).order_by('-created_at')
         user_liked_listings = LikedListing.objects.filter(
             profile=request.user.profile).all()
         user_form = UserForm(instance=request.user)
@@ -75,7 +76,8 @@ class ProfileView(View):
                                                       'user_liked_listings': user_liked_listings, })
 
     def post(self, request):
-        user_listings = Listing.objects.filter(seller=request.user.profile)
+        user_listings = Listing.objects.filter(
+            seller=request.user.profile).order_by('-created_at')
         user_liked_listings = LikedListing.objects.filter(
             profile=request.user.profile).all()
         user_form = UserForm(request.POST, instance=request.user)